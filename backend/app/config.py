@@ -1,4 +1,5 @@
 import os
+from typing import Dict
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -12,14 +13,115 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str = Field(..., description="Your Google Gemini API Key")
     MONGODB_URI: str = Field(..., description="MongoDB connection URI")
     DB_NAME: str = "voyagepal_db" # Default database name
+    # MongoDB client connection pool (per worker). These override the same options in MONGODB_URI.
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 10000  # Operations waiting longer for a connection fail instead of piling up
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGODB_COMPRESSORS: str = ""  # e.g. "zstd,snappy,zlib"; zstd and snappy need their Python packages
+    MONGODB_READ_PREFERENCE: str = "primary"
+    # Diagnostic: explain() the route queries at startup and refuse to start if any is a COLLSCAN
+    DB_EXPLAIN_QUERIES: bool = False
     JWT_SECRET_KEY: str = Field(..., description="Secret key for JWT token encryption. CHANGE THIS IN PRODUCTION!")
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Verified-token and user caches in get_current_user (per worker)
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_TOKEN_CACHE_MAX_TTL_SECONDS: int = 300  # Also capped at each token's exp
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 5000
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60
+    # Per-user trip preferences cache, written through on updates (per worker)
+    PREFERENCES_CACHE_MAX_ENTRIES: int = 5000
+    PREFERENCES_CACHE_TTL_SECONDS: int = 60
+    # Password hashing runs in a thread pool off the event loop
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # Raising this upgrades stored hashes on next login
+    PASSWORD_HASH_MAX_CONCURRENT: int = 4
+    PASSWORD_HASH_MAX_QUEUE_DEPTH: int = 64  # Callers beyond this get an immediate 503
 
     # External API Keys
     OPENWEATHER_API_KEY: str = Field(..., description="Your OpenWeatherMap API Key")
     Maps_API_KEY: str = Field(..., description="Your Google Maps Platform API Key (for Places, Directions, etc.)")
     # Add other API keys as needed
 
+    # Shared outbound HTTP client (used for OpenWeatherMap and other upstream APIs)
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    HTTP_READ_TIMEOUT_SECONDS: float = 10.0
+    HTTP_POOL_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_RETRIES: int = 2
+    HTTP_RETRY_BACKOFF_SECONDS: float = 0.25
+
+    # Weather caching
+    GEOCODE_CACHE_MAX_ENTRIES: int = 2048
+    GEOCODE_CACHE_TTL_SECONDS: int = 24 * 3600  # In-process tier
+    GEOCODE_PERSISTENT_TTL_DAYS: int = 90  # Mongo tier, enforced by a TTL index
+    FORECAST_CACHE_MAX_ENTRIES: int = 512
+    FORECAST_ISSUANCE_HOURS: int = 3  # OWM refreshes the 5-day/3-hour forecast on this cadence
+    FORECAST_COORD_PRECISION: int = 2  # Decimal places kept when keying on lat/lon (~1 km)
+    WEATHER_BATCH_MAX_ITEMS: int = 100
+    WEATHER_BATCH_CONCURRENCY: int = 8  # Distinct cities fetched in parallel per batch request
+
+    # Raw forecast slots referenced by trips (weather_snapshots collection), cached per worker
+    WEATHER_SNAPSHOT_CACHE_MAX_ENTRIES: int = 1024
+    WEATHER_SNAPSHOT_CACHE_TTL_SECONDS: int = 3600
+
+    # Background forecast prefetch for upcoming saved trips
+    WEATHER_PREFETCH_ENABLED: bool = True
+    WEATHER_PREFETCH_INTERVAL_SECONDS: int = 30 * 60
+    WEATHER_PREFETCH_HORIZON_DAYS: int = 5  # OWM free tier forecasts 5 days ahead
+    WEATHER_PREFETCH_MAX_UPSTREAM_CALLS: int = 50  # OWM requests (geocoding, forecasts, retries) allowed per cycle
+
+    # GET /trip/trips pagination
+    TRIPS_PAGE_DEFAULT_SIZE: int = 20
+    TRIPS_PAGE_MAX_SIZE: int = 100
+    TRIPS_EXPORT_BATCH_SIZE: int = 200  # Documents per cursor batch; bounds export memory per request
+
+    # Gemini model tiers: each operation runs on the "fast" or "pro" model
+    GEMINI_FAST_MODEL: str = "gemini-1.5-flash-latest"
+    GEMINI_PRO_MODEL: str = "gemini-1.5-pro-latest"
+    GEMINI_DEFAULT_TIER: str = "pro"
+    GEMINI_OPERATION_TIERS: Dict[str, str] = {
+        "initial_trip_suggestions": "fast",
+        "detailed_trip_analysis": "pro",
+        "optimize_itinerary": "pro",
+        "itinerary_notes": "fast",
+    }
+    GEMINI_DEFAULT_DEADLINE_SECONDS: float = 30.0
+    GEMINI_OPERATION_DEADLINES_SECONDS: Dict[str, float] = {
+        "initial_trip_suggestions": 20.0,
+        "detailed_trip_analysis": 40.0,
+        "optimize_itinerary": 40.0,
+        "itinerary_notes": 15.0,
+    }
+    GEMINI_FALLBACK_DEADLINE_SECONDS: float = 20.0  # Fast-tier budget after a pro-tier timeout
+    # Hedging: a pro-tier call slower than this percentile of recent calls gets a parallel fast-tier request
+    GEMINI_HEDGE_ENABLED: bool = True
+    GEMINI_HEDGE_PERCENTILE: float = 95.0
+    GEMINI_HEDGE_MIN_SAMPLES: int = 20  # No hedging until this many latencies are recorded
+    GEMINI_HEDGE_MIN_DELAY_SECONDS: float = 2.0
+    GEMINI_LATENCY_WINDOW: int = 200  # Recent samples kept per operation and tier
+
+    # Gemini call limits (per worker)
+    GEMINI_MAX_CONCURRENT_REQUESTS: int = 8
+    GEMINI_MAX_QUEUE_DEPTH: int = 32  # Callers beyond this get an immediate 503
+
+    # Gemini response cache: in-process LRU (L1) plus optional Mongo collection shared by workers (L2)
+    GEMINI_CACHE_ENABLED: bool = True
+    GEMINI_CACHE_MAX_ENTRIES: int = 1024
+    GEMINI_CACHE_TTL_SECONDS: int = 6 * 3600
+    GEMINI_CACHE_L2_ENABLED: bool = True
+
+    # Itinerary optimization: "local" uses the deterministic scheduler, "gemini" the old LLM planner
+    ITINERARY_PLANNER: str = "local"
+    ITINERARY_DAY_START: str = "9:00 AM"
+    ITINERARY_EXACT_MAX_LOCATIONS: int = 8  # Above this the scheduler uses greedy + 2-opt
+    ITINERARY_GEMINI_NOTES_ENABLED: bool = False  # Ask Gemini for step tips on local itineraries
+
+    # Analysis + itinerary jobs started together per location selection, kept per worker
+    PLAN_PRECOMPUTE_MAX_ENTRIES: int = 256
+    PLAN_PRECOMPUTE_TTL_SECONDS: int = 15 * 60
+
 settings = Settings()
 
@@ -1,22 +1,242 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
 from beanie import init_beanie
 from app.config import settings
 from app.models.user import User
 from app.models.trip import Trip
 from app.models.preferences import UserPreferences
+from app.models.geocode import GeocodeCacheEntry
+from app.models.gemini_cache import GeminiResponseCacheEntry
+from app.models.weather_snapshot import WeatherSnapshot
+from app.utils.mongo_pool import PoolStatsListener
+
+_client: Optional[AsyncIOMotorClient] = None
+_pool_stats = PoolStatsListener()
+
+# Index key patterns the route queries rely on, per collection. init_beanie creates them
+# from the Document declarations; startup checks that they actually exist.
+REQUIRED_INDEXES: Dict[str, List[List[Tuple[str, int]]]] = {
+    User.Settings.name: [[("email", ASCENDING)]],
+    UserPreferences.Settings.name: [[("user_id", ASCENDING)]],
+    Trip.Settings.name: [
+        [("user_id", ASCENDING), ("trip_date", DESCENDING)],
+        [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        [("trip_date", ASCENDING)],
+    ],
+    GeocodeCacheEntry.Settings.name: [[("key", ASCENDING)]],
+    GeminiResponseCacheEntry.Settings.name: [[("key", ASCENDING)]],
+    WeatherSnapshot.Settings.name: [[("key", ASCENDING)]],
+}
+
+
+def _route_queries() -> List[Dict[str, Any]]:
+    """The filter/sort shapes the routes and background jobs send, with placeholder values."""
+    user_id = str(ObjectId())
+    today = datetime.utcnow()
+    return [
+        {"name": "user by email (auth)", "collection": User.Settings.name,
+         "filter": {"email": "explain@example.com"}},
+        {"name": "preferences by user", "collection": UserPreferences.Settings.name,
+         "filter": {"user_id": user_id}},
+        {"name": "trips page by user", "collection": Trip.Settings.name,
+         "filter": {"user_id": user_id, "$or": [
+             {"created_at": {"$lt": today}},
+             {"created_at": today, "_id": {"$lt": ObjectId()}},
+         ]},
+         "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+        {"name": "trips export by user and date", "collection": Trip.Settings.name,
+         "filter": {"user_id": user_id, "trip_date": {"$gte": today, "$lt": today + timedelta(days=30)}},
+         "sort": [("trip_date", DESCENDING)]},
+        {"name": "trip by id and owner", "collection": Trip.Settings.name,
+         "filter": {"_id": ObjectId(), "user_id": user_id}},
+        {"name": "upcoming trips (weather prefetch)", "collection": Trip.Settings.name,
+         "filter": {"trip_date": {"$gte": today, "$lt": today + timedelta(days=3)}}},
+        {"name": "geocode cache by key", "collection": GeocodeCacheEntry.Settings.name,
+         "filter": {"key": "explain"}},
+        {"name": "gemini cache by key", "collection": GeminiResponseCacheEntry.Settings.name,
+         "filter": {"key": "explain"}},
+        {"name": "weather snapshot by key", "collection": WeatherSnapshot.Settings.name,
+         "filter": {"key": "explain"}},
+    ]
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    """All stage names in an explain() plan tree."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def verify_indexes(db: AsyncIOMotorDatabase) -> None:
+    """Raises if any index in REQUIRED_INDEXES is missing from its collection."""
+    missing = []
+    for collection, required in REQUIRED_INDEXES.items():
+        info = await db[collection].index_information()
+        # Compared as-is: text and 2dsphere indexes have string directions
+        existing = {tuple(tuple(part) for part in index["key"]) for index in info.values()}
+        for keys in required:
+            if tuple(keys) not in existing:
+                missing.append(f"{collection} {keys}")
+    if missing:
+        raise RuntimeError(f"Missing MongoDB indexes: {'; '.join(missing)}")
+
+
+async def explain_route_queries(db: AsyncIOMotorDatabase) -> Dict[str, List[str]]:
+    """
+    Runs explain() on every route query shape and raises if a winning plan contains
+    a COLLSCAN. Returns the winning plan's stages per query.
+    """
+    plans: Dict[str, List[str]] = {}
+    scans = []
+    for query in _route_queries():
+        cursor = db[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        explained = await cursor.explain()
+        stages = _plan_stages(explained.get("queryPlanner", {}).get("winningPlan", {}))
+        plans[query["name"]] = stages
+        print(f"Database: explain {query['name']}: {' <- '.join(stages)}")
+        if "COLLSCAN" in stages:
+            scans.append(query["name"])
+    if scans:
+        raise RuntimeError(f"Route queries fall back to a collection scan: {', '.join(scans)}")
+    return plans
+
+
+async def _duplicate_groups(collection: Any, field: str) -> List[Dict[str, Any]]:
+    """
+    Values of `field` held by more than one document, each with its document _ids
+    oldest first. Skips the scan when a unique index on the field already exists.
+    """
+    info = await collection.index_information()
+    if any(list(index["key"]) == [(field, ASCENDING)] and index.get("unique") for index in info.values()):
+        return []
+    cursor = collection.aggregate([
+        {"$sort": {"_id": ASCENDING}},
+        {"$group": {"_id": f"${field}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+    return [group async for group in cursor]
+
 
-async def initiate_database():
-    """Initializes MongoDB connection and Beanie ODM."""
+async def dedupe_preferences(db: AsyncIOMotorDatabase) -> None:
+    """
+    The old get-then-insert in the preferences routes could create several documents
+    for one user, which would make the unique user_id index build fail. Deletes the
+    extras, keeping each user's oldest (the one find_one has been returning), and logs
+    every _id it removes.
+    """
+    collection = db[UserPreferences.Settings.name]
+    for group in await _duplicate_groups(collection, "user_id"):
+        keep, extra = group["ids"][0], group["ids"][1:]
+        print(
+            f"Database: user_preferences for user {group['_id']}: keeping {keep}, "
+            f"deleting duplicates {', '.join(str(_id) for _id in extra)}"
+        )
+        await collection.delete_many({"_id": {"$in": extra}})
+
+
+async def check_duplicate_emails(db: AsyncIOMotorDatabase) -> None:
+    """
+    Registrations that raced before the unique email index existed can have left several
+    accounts with one email. Those can't be merged automatically, so this raises with the
+    conflicting account _ids instead of letting the index build fail in init_beanie.
+    """
+    groups = await _duplicate_groups(db[User.Settings.name], "email")
+    if groups:
+        details = "; ".join(
+            f"{group['_id']}: {', '.join(str(_id) for _id in group['ids'])}" for group in groups
+        )
+        raise RuntimeError(
+            f"Cannot create the unique users.email index: {len(groups)} email(s) belong to "
+            f"more than one account. Merge or remove the extra accounts, then restart. {details}"
+        )
+
+
+def _build_client() -> AsyncIOMotorClient:
+    """Creates the Motor client using the pool, timeout and compression options from settings."""
+    options: Dict[str, Any] = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": settings.MONGODB_READ_PREFERENCE,
+        "event_listeners": [_pool_stats],
+    }
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    return AsyncIOMotorClient(settings.MONGODB_URI, **options)
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Returns the client opened by initiate_database()."""
+    if _client is None:
+        raise RuntimeError("The database client is not initialized; call initiate_database() first.")
+    return _client
+
+
+async def initiate_database() -> AsyncIOMotorClient:
+    """
+    Opens the MongoDB client, initializes Beanie ODM and checks the indexes the routes
+    need. Called from the app lifespan, which closes the client with close_database().
+    """
+    global _client
     try:
-        client = AsyncIOMotorClient(settings.MONGODB_URI)
-        await init_beanie(database=client[settings.DB_NAME], document_models=[
+        _client = _build_client()
+        db = _client[settings.DB_NAME]
+        await dedupe_preferences(db)
+        await check_duplicate_emails(db)
+        # Creates the indexes declared on each Document
+        await init_beanie(database=db, document_models=[
             User,
             Trip,
             UserPreferences,
+            GeocodeCacheEntry,
+            GeminiResponseCacheEntry,
+            WeatherSnapshot,
             # Add other Beanie Documents here as they are defined
         ])
+        await verify_indexes(db)
+        if settings.DB_EXPLAIN_QUERIES:
+            await explain_route_queries(db)
         print(f"Successfully connected to MongoDB database: {settings.DB_NAME}")
+        return _client
     except Exception as e:
         print(f"Error connecting to MongoDB: {e}")
-        # Depending on criticality, you might want to exit or retry here
-        raise
\ No newline at end of file
+        close_database()
+        raise
+
+
+def close_database() -> None:
+    """Closes the MongoDB client and its connection pool. Called on app shutdown."""
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = None
+
+
+async def get_database_health() -> Dict[str, Any]:
+    """Ping round trip to the server plus this worker's connection pool usage per server."""
+    health: Dict[str, Any] = {"status": "ok", "database": settings.DB_NAME}
+    started = time.perf_counter()
+    try:
+        await get_client().admin.command("ping")
+        health["ping_ms"] = round(1000 * (time.perf_counter() - started), 2)
+    except Exception as e:
+        # The endpoint is unauthenticated: keep connection details out of the response
+        print(f"Database: health check ping failed: {e!r}")
+        health.update({"status": "unavailable", "ping_ms": None})
+    health["pool"] = _pool_stats.stats(settings.MONGODB_MAX_POOL_SIZE)
+    return health
@@ -2,8 +2,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-from app.database import initiate_database
-from .routes import auth, trip_planning, data_fetch, user_preferences
+from app.database import initiate_database, close_database
+from app.utils.http_client import init_http_client, close_http_client
+from app.services.weather_service import WeatherService
+from app.services.weather_prefetcher import WeatherPrefetcher
+from .routes import auth, trip_planning, data_fetch, user_preferences, health
 from app.config import settings  # Import settings to get CORS origins
 
 
@@ -11,10 +14,20 @@ from app.config import settings  # Import settings to get CORS origins
 async def lifespan(app: FastAPI):
     """
     Handles startup and shutdown events for the FastAPI application.
-    Initializes the database connection.
+    Opens the database client and the shared outbound HTTP pool, runs the
+    background weather prefetcher, and closes everything on shutdown.
     """
     await initiate_database()
+    await init_http_client()
+    prefetcher = None
+    if settings.WEATHER_PREFETCH_ENABLED:
+        prefetcher = WeatherPrefetcher(WeatherService())
+        prefetcher.start()
     yield
+    if prefetcher is not None:
+        await prefetcher.stop()
+    await close_http_client()
+    close_database()
 
 
 app = FastAPI(
@@ -44,6 +57,7 @@ app.include_router(data_fetch.router, prefix="/api/v1/data", tags=["Data Fetchin
 app.include_router(
     user_preferences.router, prefix="/api/v1/user", tags=["User Preferences"]
 )
+app.include_router(health.router, prefix="/api/v1/health", tags=["Health"])
 
 
 @app.get("/")
@@ -0,0 +1,25 @@
+from beanie import Document, Indexed
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from typing import Any, Dict
+from datetime import datetime
+
+from app.config import settings
+
+
+class GeminiResponseCacheEntry(Document):
+    """MongoDB Document sharing cached Gemini responses across workers."""
+
+    key: Indexed(str, unique=True) = Field(..., description="Hash of the canonical request inputs.")
+    operation: str = Field(..., description="GeminiService operation that produced the response.")
+    response: Dict[str, Any] = Field(..., description="The validated model output, as a dict.")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "gemini_response_cache"
+        indexes = [
+            IndexModel(
+                [("created_at", ASCENDING)],
+                expireAfterSeconds=settings.GEMINI_CACHE_TTL_SECONDS,
+            ),
+        ]
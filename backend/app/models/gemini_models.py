@@ -42,6 +42,10 @@ class InitialTripResponse(InitialTripSuggestions):
     trip_id: str = Field(
         description="The unique ID of the newly created draft trip in the database."
     )
+    version: int = Field(
+        0,
+        description="Trip version; send it as expected_version with the next plan step.",
+    )
 
 
 # --- END NEW MODEL ---
@@ -95,6 +99,17 @@ class OptimizedItinerary(BaseModel):
     )
 
 
+class ItineraryNotes(BaseModel):
+    """Free-text tips Gemini adds to a locally scheduled itinerary."""
+
+    step_notes: List[str] = Field(
+        description="One short tip per itinerary step, in step order. Empty string if none."
+    )
+    feasibility_notes: str = Field(
+        description="One or two sentences of advice about the overall day plan."
+    )
+
+
 class TripPlanningAnalysis(BaseModel):
     """Comprehensive analysis from Gemini for trip planning details."""
 
@@ -126,3 +141,21 @@ class TripPlanningAnalysis(BaseModel):
     location_info: List[Dict[str, Any]] = Field(
         description="Detailed information about each selected location, including general info, typical hours, etc."
     )
+
+
+class TripPlanningAnalysisResponse(TripPlanningAnalysis):
+    """Response model for the detailed analysis endpoint, with the trip's new version."""
+
+    trip_id: str = Field(description="The ID of the updated trip.")
+    version: int = Field(
+        description="Trip version after this update; send it as expected_version next."
+    )
+
+
+class OptimizedItineraryResponse(OptimizedItinerary):
+    """Response model for the optimize itinerary endpoint, with the trip's new version."""
+
+    trip_id: str = Field(description="The ID of the updated trip.")
+    version: int = Field(
+        description="Trip version after this update; send it as expected_version next."
+    )
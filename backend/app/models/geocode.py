@@ -0,0 +1,26 @@
+from beanie import Document, Indexed
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from datetime import datetime
+
+from app.config import settings
+
+
+class GeocodeCacheEntry(Document):
+    """MongoDB Document caching city name -> coordinates lookups across workers."""
+
+    key: Indexed(str, unique=True) = Field(..., description="Normalized city name.")
+    query: str = Field(..., description="City name as originally requested.")
+    lat: float
+    lon: float
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "geocode_cache"
+        indexes = [
+            # Mongo's TTL monitor drops entries once they are older than the configured lifetime
+            IndexModel(
+                [("created_at", ASCENDING)],
+                expireAfterSeconds=settings.GEOCODE_PERSISTENT_TTL_DAYS * 24 * 3600,
+            ),
+        ]
@@ -1,6 +1,7 @@
-from beanie import Document
-from pydantic import Field
-from typing import List, Dict, Any, Optional
+from beanie import Document, PydanticObjectId
+from pydantic import BaseModel, Field, model_validator
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from typing import List, Dict, Any, Literal, Optional
 from datetime import datetime
 from app.models.location import Location # Import the Location model
 
@@ -21,8 +22,98 @@ class Trip(Document):
     estimated_costs: Dict[str, Any] = Field(default_factory=dict, description="Breakdown of estimated costs.")
     weather_info: Dict[str, Any] = Field(default_factory=dict, description="Weather snapshot for the trip date.")
     travel_tips: List[str] = Field(default_factory=list, description="Practical travel tips for the trip.")
+    status: Literal["draft", "analyzed", "planned"] = Field("draft", description="How far through planning the trip is.")
+    version: int = Field(0, description="Incremented by every plan update; pass as expected_version to detect concurrent writes.")
+    # Written by PlanPrecomputer so any worker can serve them; left out of API responses
+    plan_results: Dict[str, Any] = Field(default_factory=dict, exclude=True, description="Generated analysis and itinerary, each with a hash of the inputs it was generated from.")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
-        name = "trips" # Collection name in MongoDB
\ No newline at end of file
+        name = "trips" # Collection name in MongoDB
+        indexes = [
+            # A user's trips by date; the user_id prefix also serves plain per-user lookups
+            IndexModel([("user_id", ASCENDING), ("trip_date", DESCENDING)], name="user_id_trip_date"),
+            # Newest-first listing; _id breaks created_at ties so pagination cursors are stable
+            IndexModel(
+                [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_id_created_at_id",
+            ),
+            # Upcoming-trip scan in the weather prefetcher
+            IndexModel([("trip_date", ASCENDING)], name="trip_date"),
+        ]
+
+class TripSummary(BaseModel):
+    """Lightweight projection of a Trip for listings; the full document comes from the detail endpoint."""
+    id: str
+    destination: str
+    trip_date: datetime
+    return_time: str
+    status: Literal["draft", "analyzed", "planned"] = "draft"
+    pace: Optional[str] = None
+    location_names: List[str] = Field(default_factory=list)
+    total_estimated_cost_usd: Optional[float] = None
+    created_at: datetime
+
+    class Settings:
+        # Only these paths are read from MongoDB; itinerary and weather blobs are never loaded
+        projection = {
+            "_id": 1,
+            "destination": 1,
+            "trip_date": 1,
+            "return_time": 1,
+            "status": 1,
+            "preferences.pace": 1,
+            "selected_locations.name": 1,
+            "estimated_costs.total_itinerary_cost_usd": 1,
+            "created_at": 1,
+        }
+
+    @model_validator(mode="before")
+    @classmethod
+    def _from_projected_document(cls, data: Any) -> Any:
+        if not isinstance(data, dict) or "_id" not in data:
+            return data
+        return {
+            "id": str(data["_id"]),
+            "destination": data.get("destination"),
+            "trip_date": data.get("trip_date"),
+            "return_time": data.get("return_time"),
+            "status": data.get("status") or "draft",
+            "pace": (data.get("preferences") or {}).get("pace"),
+            "location_names": [loc.get("name") for loc in data.get("selected_locations") or [] if loc.get("name")],
+            "total_estimated_cost_usd": (data.get("estimated_costs") or {}).get("total_itinerary_cost_usd"),
+            "created_at": data.get("created_at"),
+        }
+
+
+class TripDraft(BaseModel):
+    """Projection of a Trip with what the plan steps read: its preferences, saved forecast, current selection and stored results."""
+    id: PydanticObjectId = Field(..., alias="_id")
+    destination: str
+    trip_date: datetime
+    status: str = "draft"
+    preferences: Dict[str, Any] = Field(default_factory=dict)
+    selected_locations: List[Dict[str, Any]] = Field(default_factory=list)
+    weather_info: Dict[str, Any] = Field(default_factory=dict)
+    plan_results: Dict[str, Any] = Field(default_factory=dict)
+
+    class Settings:
+        projection = {
+            "_id": 1,
+            "destination": 1,
+            "trip_date": 1,
+            "status": 1,
+            "preferences": 1,
+            "selected_locations": 1,
+            "weather_info.forecast": 1,
+            "weather_info.snapshot_key": 1,
+            "weather_info.raw_weather_data": 1,  # Trips saved before weather snapshots
+            "plan_results": 1,
+        }
+
+
+class TripListResponse(BaseModel):
+    """One page of a user's trips, newest first."""
+    trips: List[TripSummary]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to get the next page; null on the last page.")
@@ -9,7 +9,7 @@ from typing import Optional
 class User(Document):
     """MongoDB Document for user data."""
 
-    email: str  # Back to EmailStr directly
+    email: Indexed(str, unique=True)  # Login lookups; also rejects duplicate registrations
     hashed_password: str
     full_name: Optional[str] = None
 
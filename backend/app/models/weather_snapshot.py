@@ -0,0 +1,20 @@
+from beanie import Document, Indexed
+from pydantic import Field
+from typing import Any, Dict
+from datetime import datetime
+
+
+class WeatherSnapshot(Document):
+    """
+    MongoDB Document holding one OpenWeatherMap forecast slot for a location. Content
+    addressed: every trip to the same city and slot references the same document.
+    """
+
+    key: Indexed(str, unique=True) = Field(..., description="Hash of the normalized city and the slot payload.")
+    city: str = Field(..., description="Normalized city name.")
+    forecast_time: datetime = Field(..., description="Start of the forecast slot (UTC).")
+    data: Dict[str, Any] = Field(..., description="The raw OWM forecast slot.")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "weather_snapshots"
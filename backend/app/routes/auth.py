@@ -5,14 +5,20 @@ from pydantic import (
     EmailStr,
 )  # Keep EmailStr if you fixed the Pydantic error in user.py, otherwise it should be just 'str' now
 from datetime import timedelta
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
+from pymongo.errors import DuplicateKeyError
 
 from app.models.user import User
 from app.utils.auth_utils import (
     create_access_token,
-    verify_password,
+    verify_and_update_password,
     get_password_hash,
+    invalidate_user_cache,
+    get_auth_cache_stats,
+    get_password_hash_stats,
+    get_current_user,
 )  # get_current_user is REMOVED from here now
+from app.utils.concurrency import ServiceOverloadedError
 from app.config import settings
 
 router = APIRouter()
@@ -39,11 +45,25 @@ async def register_user(user: UserCreate):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await get_password_hash(user.password)
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "2"},
+        )
     new_user = User(
         email=user.email, hashed_password=hashed_password, full_name=user.full_name
     )
-    await new_user.insert()
+    try:
+        await new_user.insert()
+    except DuplicateKeyError:
+        # A concurrent registration for the same email won the unique index
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
+        )
+    invalidate_user_cache(new_user.email)
     return {"message": "User registered successfully"}
 
 
@@ -51,14 +71,40 @@ async def register_user(user: UserCreate):
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login and get an access token."""
     user = await User.find_one(User.email == form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await verify_and_update_password(
+                form_data.password, user.hashed_password
+            )
+        except ServiceOverloadedError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": "2"},
+            )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash used an outdated cost factor; upgrade it now that we have the password
+        await user.set({User.hashed_password: new_hash})
+        invalidate_user_cache(user.email)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = await create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.get("/stats", response_model=Dict[str, Dict[str, Any]])
+async def get_auth_stats(current_user: User = Depends(get_current_user)):
+    """
+    Verified-token and user cache counters and password hashing pool metrics for this worker.
+    """
+    stats = get_auth_cache_stats()
+    stats["password_hashing"] = get_password_hash_stats()
+    return stats
@@ -1,14 +1,52 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
-from datetime import datetime
-from typing import Dict, Any
+from pydantic import BaseModel, Field
+from datetime import datetime, date
+from typing import Dict, Any, List, Optional
 
-from app.services.weather_service import WeatherService
+from app.config import settings
+from app.services.weather_service import (
+    WeatherService,
+    WeatherUnavailableError,
+    get_forecast_cache_stats,
+    normalize_city_name,
+)
 from app.utils.auth_utils import get_current_user
 from app.models.user import User # <--- ADD THIS IMPORT
 
 router = APIRouter()
 weather_service = WeatherService()
 
+
+class WeatherBatchItem(BaseModel):
+    city_name: str = Field(..., description="City to fetch the forecast for, e.g., 'Chicago'.")
+    date: str = Field(..., description="Date in YYYY-MM-DD format.")
+
+
+class WeatherBatchRequest(BaseModel):
+    items: List[WeatherBatchItem] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.WEATHER_BATCH_MAX_ITEMS,
+        description="(city, date) pairs to fetch forecasts for.",
+    )
+
+
+class WeatherBatchResult(BaseModel):
+    city_name: str
+    date: str
+    weather: Optional[Dict[str, Any]] = Field(
+        None, description="Same payload as the single-city endpoint, if successful."
+    )
+    error: Optional[str] = Field(None, description="Why this item could not be fetched.")
+
+
+class WeatherBatchResponse(BaseModel):
+    results: List[WeatherBatchResult] = Field(
+        description="One result per requested item, in request order."
+    )
+
+
 @router.get("/weather/{city_name}/{date_str}", response_model=Dict[str, Any])
 async def get_weather_data(
     city_name: str,
@@ -31,4 +69,68 @@ async def get_weather_data(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching weather data: {e}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/weather/batch", response_model=WeatherBatchResponse)
+async def get_weather_data_batch(
+    request: WeatherBatchRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Fetch weather forecasts for many (city, date) pairs in one call.
+    Each distinct city's forecast is fetched once, cities are fetched concurrently
+    (bounded), and failures are reported per item instead of failing the batch.
+    """
+    results: List[WeatherBatchResult] = [
+        WeatherBatchResult(city_name=item.city_name, date=item.date)
+        for item in request.items
+    ]
+
+    # Group item indexes by city so each forecast is fetched once for all its dates
+    groups: Dict[str, Dict[str, Any]] = {}
+    for index, item in enumerate(request.items):
+        try:
+            target_date = datetime.strptime(item.date, "%Y-%m-%d").date()
+        except ValueError:
+            results[index].error = "Invalid date format. Use YYYY-MM-DD."
+            continue
+        group = groups.setdefault(
+            normalize_city_name(item.city_name),
+            {"city_name": item.city_name, "entries": []},
+        )
+        group["entries"].append((index, target_date))
+
+    semaphore = asyncio.Semaphore(settings.WEATHER_BATCH_CONCURRENCY)
+
+    async def fetch_group(group: Dict[str, Any]) -> None:
+        entries: List[tuple] = group["entries"]
+        try:
+            async with semaphore:
+                forecasts: Dict[date, Dict[str, Any]] = (
+                    await weather_service.get_weather_forecasts(
+                        group["city_name"],
+                        [target_date for _, target_date in entries],
+                        raise_errors=True,
+                    )
+                )
+            for index, target_date in entries:
+                results[index].weather = forecasts[target_date]
+        except WeatherUnavailableError as e:
+            for index, _ in entries:
+                results[index].error = str(e)
+        except Exception as e:
+            print(f"Error in weather batch for city '{group['city_name']}': {e}")
+            for index, _ in entries:
+                results[index].error = f"Error fetching weather data: {e}"
+
+    await asyncio.gather(*(fetch_group(group) for group in groups.values()))
+    return WeatherBatchResponse(results=results)
+
+
+@router.get("/weather-cache/stats", response_model=Dict[str, int])
+async def get_weather_cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    Hit/miss/coalesce counters for the in-process forecast cache of this worker.
+    """
+    return get_forecast_cache_stats()
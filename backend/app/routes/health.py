@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Response, status
+from typing import Any, Dict
+
+from app.database import get_database_health
+
+router = APIRouter()
+
+
+@router.get("/db", response_model=Dict[str, Any])
+async def database_health(response: Response):
+    """
+    MongoDB ping latency and this worker's connection pool usage (open, checked out,
+    available, wait-queue depth) for each server. Returns 503 when the ping fails.
+    """
+    health = await get_database_health()
+    if health["status"] != "ok":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return health
@@ -1,27 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import List, Dict, Any, Optional, Literal
+from beanie import PydanticObjectId
+from beanie.operators import And, In, Inc, Or, Set
+from bson.errors import InvalidId
+from pymongo import DESCENDING, ReturnDocument
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Literal, AsyncIterator, Tuple
 
-from app.services.gemini_service import GeminiService
+from app.services.gemini_service import (
+    GeminiService,
+    get_gemini_cache_stats,
+    get_gemini_limiter_stats,
+    get_gemini_tier_stats,
+)
 from app.services.weather_service import WeatherService
 from app.services.maps_routing_service import MapsRoutingService  # Placeholder
 from app.services.attractions_service import AttractionsService  # Placeholder
 from app.services.public_transit_service import PublicTransitService  # Placeholder
 from app.services.budget_calculator import BudgetCalculator  # Placeholder
 from app.services.recommendation_engine import RecommendationEngine
+from app.services.itinerary_scheduler import ItineraryScheduler
+from app.services.plan_precompute import PlanPrecomputer, get_plan_precompute_stats
+from app.services.weather_snapshots import WeatherSnapshotStore, trip_weather_fields
 
 from app.models.user import User
 from app.models.preferences import UserPreferences
-from app.models.trip import Trip, TripLocation
+from app.models.trip import Trip, TripDraft, TripListResponse, TripLocation, TripSummary
 from app.models.location import Location  # Base Location model
+from app.config import settings
 from app.utils.auth_utils import get_current_user
+from app.utils.concurrency import ServiceOverloadedError
+from app.utils.json_repair import get_json_parse_stats
 from app.models.gemini_models import (
     InitialTripSuggestions,
     TripPlanningAnalysis,
     OptimizedItinerary,
     SuggestedLocation,  # Used in request body
     InitialTripResponse,  # <--- ADDED THIS IMPORT
+    TripPlanningAnalysisResponse,
+    OptimizedItineraryResponse,
 )
 
 router = APIRouter()
@@ -33,6 +54,11 @@ attractions_service = AttractionsService()
 public_transit_service = PublicTransitService()
 budget_calculator = BudgetCalculator()
 recommendation_engine = RecommendationEngine(gemini_service)  # Pass gemini service
+itinerary_scheduler = ItineraryScheduler(
+    maps_routing_service, budget_calculator, gemini_service
+)
+weather_snapshots = WeatherSnapshotStore()
+plan_precomputer = PlanPrecomputer(weather_service, gemini_service, itinerary_scheduler)
 
 
 class InitialPlanRequest(BaseModel):
@@ -68,13 +94,64 @@ class LocationSelectionRequest(BaseModel):
     destination: str = Field(..., description="The city for the trip.")
     trip_date: str = Field(..., description="Date of the trip in YYYY-MM-DD format.")
     return_time: str = Field(..., description="Desired return time.")
-    user_preferences: Dict[str, Any] = Field(
-        ..., description="Snapshot of user preferences used for this trip."
+    user_preferences: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Ignored; the preferences saved with the trip by the initial suggestions step are used.",
     )
     selected_locations: List[SuggestedLocation] = Field(
         ...,
         description="List of locations chosen by the user from initial suggestions.",
     )
+    expected_version: Optional[int] = Field(
+        None,
+        description=(
+            "Trip version from the previous plan step's response. If given, the update is "
+            "rejected with 409 when the trip has changed since; omit it to skip the check."
+        ),
+    )
+
+
+async def _save_draft_trip(
+    request: InitialPlanRequest,
+    current_user: User,
+    trip_date_obj: datetime,
+    suggestions: InitialTripSuggestions,
+    weather_data: Dict[str, Any],
+) -> Trip:
+    """Saves the initial draft trip for a set of suggestions."""
+    # The raw forecast slot goes to the shared snapshot store; the trip keeps a reference
+    snapshot_key = await weather_snapshots.save(request.destination, weather_data)
+    # Note: Beanie Document's _id is auto-generated on insert.
+    new_trip = Trip(
+        user_id=str(current_user.id),
+        destination=request.destination,
+        trip_date=trip_date_obj,
+        return_time=request.return_time,
+        preferences={
+            "interests": request.interests,
+            "pace": request.pace,
+            "preferred_transport": request.preferred_transport,
+            "budget_range": request.budget_range,
+        },
+        selected_locations=[],  # No locations selected yet
+        itinerary=[],
+        estimated_costs={},
+        weather_info={
+            "general_advice": suggestions.general_weather_advice,
+            "clothing_suggestion": suggestions.clothing_suggestion,
+            "umbrella_needed": suggestions.umbrella_needed,
+            "forecast": trip_weather_fields(weather_data),
+            "snapshot_key": snapshot_key,
+        },
+        travel_tips=[],  # Will be filled later
+    )
+    await new_trip.insert()
+    return new_trip
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 
 @router.post(
@@ -104,38 +181,23 @@ async def get_initial_suggestions(
             weather_data=weather_data,  # Pass weather data to the engine
         )
 
-        # Save initial draft trip to DB
-        # Note: Beanie Document's _id is auto-generated on insert.
-        new_trip = Trip(
-            user_id=str(current_user.id),
-            destination=request.destination,
-            trip_date=trip_date_obj,
-            return_time=request.return_time,
-            preferences={
-                "interests": request.interests,
-                "pace": request.pace,
-                "preferred_transport": request.preferred_transport,
-                "budget_range": request.budget_range,
-            },
-            selected_locations=[],  # No locations selected yet
-            itinerary=[],
-            estimated_costs={},
-            weather_info={
-                "general_advice": suggestions.general_weather_advice,
-                "clothing_suggestion": suggestions.clothing_suggestion,
-                "umbrella_needed": suggestions.umbrella_needed,
-                "raw_weather_data": weather_data,  # Store raw weather data for context
-            },
-            travel_tips=[],  # Will be filled later
+        new_trip = await _save_draft_trip(
+            request, current_user, trip_date_obj, suggestions, weather_data
         )
-        await new_trip.insert()
 
         # Augment the response with the new trip's ID so frontend can track it
         response_data = suggestions.model_dump()
         response_data["trip_id"] = str(new_trip.id)  # Convert ObjectId to string
+        response_data["version"] = new_trip.version
 
         return response_data  # This now matches InitialTripResponse model
 
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"},
+        )
     except Exception as e:
         print(f"Error in initial suggestions endpoint: {e}")
         raise HTTPException(
@@ -144,74 +206,206 @@ async def get_initial_suggestions(
         )
 
 
-@router.post("/plan/detailed-analysis", response_model=TripPlanningAnalysis)
-async def get_detailed_analysis(
-    request: LocationSelectionRequest, current_user: User = Depends(get_current_user)
+@router.post("/plan/initial-suggestions/stream")
+async def stream_initial_suggestions(
+    request: InitialPlanRequest, current_user: User = Depends(get_current_user)
 ):
     """
-    Get detailed trip analysis (weather, dress, costs, tips) based on selected locations.
-    Updates the draft trip in the database.
+    Streaming variant of /plan/initial-suggestions using server-sent events.
+    Emits `weather_advice`, `clothing_suggestion` and `umbrella_needed` events and one
+    `location` event per suggested location as soon as each is complete, then a
+    `complete` event with the full InitialTripResponse once the draft trip is saved.
+    Failures after the stream has started are reported as an `error` event.
     """
     try:
         trip_date_obj = datetime.strptime(request.trip_date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use YYYY-MM-DD.",
+        )
 
-        # Fetch weather data for Gemini to consider
-        weather_data = await weather_service.get_weather_forecast(
-            request.destination, trip_date_obj
+    field_events = {
+        "general_weather_advice": "weather_advice",
+        "clothing_suggestion": "clothing_suggestion",
+        "umbrella_needed": "umbrella_needed",
+    }
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            weather_data = await weather_service.get_weather_forecast(
+                request.destination, trip_date_obj
+            )
+            async for kind, payload in recommendation_engine.stream_initial_trip_suggestions(
+                city=request.destination,
+                interests=request.interests,
+                pace=request.pace,
+                trip_date=trip_date_obj,
+                weather_data=weather_data,
+            ):
+                if kind == "field":
+                    name, value = payload
+                    if name in field_events:
+                        yield _sse_event(field_events[name], {name: value})
+                elif kind == "location":
+                    yield _sse_event("location", payload.model_dump())
+                elif kind == "complete":
+                    new_trip = await _save_draft_trip(
+                        request, current_user, trip_date_obj, payload, weather_data
+                    )
+                    response_data = payload.model_dump()
+                    response_data["trip_id"] = str(new_trip.id)
+                    response_data["version"] = new_trip.version
+                    yield _sse_event("complete", response_data)
+        except ServiceOverloadedError as e:
+            yield _sse_event("error", {"status": 503, "detail": str(e)})
+        except Exception as e:
+            print(f"Error in streaming initial suggestions endpoint: {e}")
+            yield _sse_event(
+                "error",
+                {"status": 500, "detail": f"Error getting initial suggestions: {e}"},
+            )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _get_owned_draft(
+    trip_id: Optional[str], current_user: User, purpose: str
+) -> TripDraft:
+    """Loads what the plan steps need from the user's draft trip, enforcing ownership in the query."""
+    if not trip_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Trip ID is required for {purpose}.",
+        )
+    draft = None
+    if PydanticObjectId.is_valid(trip_id):
+        draft = await Trip.find_one(
+            Trip.id == PydanticObjectId(trip_id), Trip.user_id == str(current_user.id)
+        ).project(TripDraft)
+    if draft is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trip not found or unauthorized.",
         )
+    return draft
 
-        analysis = await gemini_service.get_detailed_trip_analysis(
-            city=request.destination,
-            trip_date=trip_date_obj,
-            selected_locations=[loc.model_dump() for loc in request.selected_locations],
-            return_time=request.return_time,
-            user_preferences=request.user_preferences,
-            weather_data=weather_data,  # Pass weather data to Gemini
+
+async def _update_owned_trip(
+    trip_id: PydanticObjectId,
+    current_user: User,
+    expected_version: Optional[int],
+    changes: Dict[str, Any],
+) -> int:
+    """
+    Applies `changes` as one $set matched on _id and user_id (and the expected version,
+    if given), bumping the trip's version. Only the listed fields are written, and only
+    the new version is read back; it is returned for the client's next expected_version.
+    """
+    owned = [Trip.id == trip_id, Trip.user_id == str(current_user.id)]
+    filters = list(owned)
+    if expected_version is not None:
+        # Trips saved before versioning have no version field; they count as version 0
+        filters.append(
+            In(Trip.version, [0, None]) if expected_version == 0 else Trip.version == expected_version
+        )
+    update = Trip.find_one(*filters).update(
+        Set({**changes, Trip.updated_at: datetime.utcnow()}), Inc({Trip.version: 1})
+    )
+    updated = await Trip.get_motor_collection().find_one_and_update(
+        update.find_query,
+        update.update_query,
+        projection={"version": True},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is not None:
+        return updated["version"]
+    if expected_version is not None and await Trip.find(*owned).count():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Trip was modified by another request. Reload it and retry.",
         )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Trip not found or unauthorized.",
+    )
 
-        # Update the draft trip in DB with analysis data
-        if request.trip_id:
-            existing_trip = await Trip.get(request.trip_id)
-            if existing_trip and str(existing_trip.user_id) == str(current_user.id):
-                existing_trip.weather_info.update(
-                    {
-                        "summary": analysis.weather_summary,
-                        "clothing_suggestion": analysis.clothing_suggestion,
-                        "umbrella_needed": analysis.carry_umbrella,
-                    }
-                )
-                # Using update() for dicts to merge rather than overwrite
-                existing_trip.estimated_costs.update(
-                    {
-                        "gas_usd": analysis.estimated_gas_cost_usd,
-                        "public_transit_usd": analysis.estimated_public_transit_cost_usd,
-                        "ride_share_usd": analysis.estimated_ride_share_cost_usd,
-                        "general_money_tips": analysis.general_money_tips,
-                    }
-                )
-                existing_trip.travel_tips = analysis.other_carry_items + [
-                    analysis.transportation_tips
-                ]
-                existing_trip.selected_locations = [
-                    TripLocation(**loc.model_dump())
-                    for loc in request.selected_locations
-                ]
-                existing_trip.updated_at = datetime.utcnow()
-                await existing_trip.save()
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Trip not found or unauthorized.",
-                )
-        else:
-            # If trip_id is not provided for analysis, this endpoint expects it to update an existing session.
-            # You might choose to make it optional and create a new trip here if no ID is given.
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Trip ID is required for detailed analysis updates.",
-            )
 
-        return analysis
+def _selection_kwargs(request: LocationSelectionRequest, draft: TripDraft) -> Dict[str, Any]:
+    """Inputs shared by analysis and itinerary generation for one location selection."""
+    return {
+        "city": request.destination,
+        "trip_date": datetime.strptime(request.trip_date, "%Y-%m-%d"),
+        "selected_locations": [loc.model_dump() for loc in request.selected_locations],
+        "return_time": request.return_time,
+        # The trip's own snapshot, not the client's copy or the user-wide profile
+        "user_preferences": draft.preferences,
+    }
+
+
+@router.post("/plan/detailed-analysis", response_model=TripPlanningAnalysisResponse)
+async def get_detailed_analysis(
+    request: LocationSelectionRequest, current_user: User = Depends(get_current_user)
+):
+    """
+    Get detailed trip analysis (weather, dress, costs, tips) based on selected locations.
+    Updates the draft trip in the database. The itinerary for the same selection is
+    generated alongside, so a following /plan/optimize-itinerary call is served from it.
+    """
+    try:
+        draft = await _get_owned_draft(
+            request.trip_id, current_user, "detailed analysis updates"
+        )
+        analysis = await plan_precomputer.get_analysis(
+            draft, str(current_user.id), **_selection_kwargs(request, draft)
+        )
+
+        selected_locations = [
+            TripLocation(**loc.model_dump()).model_dump()
+            for loc in request.selected_locations
+        ]
+        changes: Dict[str, Any] = {}
+        if draft.status != "planned" or selected_locations != draft.selected_locations:
+            # A new selection makes any earlier itinerary stale; re-analyzing the planned
+            # selection keeps the trip planned
+            changes = {
+                Trip.status: "analyzed",
+                Trip.itinerary: [],
+                "estimated_costs.total_itinerary_cost_usd": None,
+            }
+
+        # Dotted paths merge into the existing dicts rather than overwriting them
+        version = await _update_owned_trip(
+            draft.id,
+            current_user,
+            request.expected_version,
+            {
+                **changes,
+                "weather_info.summary": analysis.weather_summary,
+                "weather_info.clothing_suggestion": analysis.clothing_suggestion,
+                "weather_info.umbrella_needed": analysis.carry_umbrella,
+                "estimated_costs.gas_usd": analysis.estimated_gas_cost_usd,
+                "estimated_costs.public_transit_usd": analysis.estimated_public_transit_cost_usd,
+                "estimated_costs.ride_share_usd": analysis.estimated_ride_share_cost_usd,
+                "estimated_costs.general_money_tips": analysis.general_money_tips,
+                Trip.travel_tips: analysis.other_carry_items + [analysis.transportation_tips],
+                Trip.selected_locations: selected_locations,
+            },
+        )
+
+        return {**analysis.model_dump(), "trip_id": str(draft.id), "version": version}
+    except HTTPException:
+        raise
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"},
+        )
     except Exception as e:
         print(f"Error in detailed analysis endpoint: {e}")
         raise HTTPException(
@@ -220,7 +414,7 @@ async def get_detailed_analysis(
         )
 
 
-@router.post("/plan/optimize-itinerary", response_model=OptimizedItinerary)
+@router.post("/plan/optimize-itinerary", response_model=OptimizedItineraryResponse)
 async def optimize_and_confirm_itinerary(
     request: LocationSelectionRequest,  # Can reuse this model
     current_user: User = Depends(get_current_user),
@@ -230,43 +424,35 @@ async def optimize_and_confirm_itinerary(
     Updates the trip in the database with the final itinerary.
     """
     try:
-        trip_date_obj = datetime.strptime(request.trip_date, "%Y-%m-%d")
-
-        optimized_plan = await gemini_service.optimize_itinerary(
-            city=request.destination,
-            trip_date=trip_date_obj,
-            selected_locations=[loc.model_dump() for loc in request.selected_locations],
-            return_time=request.return_time,
-            user_preferences=request.user_preferences,
+        draft = await _get_owned_draft(
+            request.trip_id, current_user, "itinerary optimization"
+        )
+        optimized_plan = await plan_precomputer.get_itinerary(
+            draft, str(current_user.id), **_selection_kwargs(request, draft)
         )
 
-        # Update the trip in DB with the final itinerary
-        if request.trip_id:
-            existing_trip = await Trip.get(request.trip_id)
-            if existing_trip and str(existing_trip.user_id) == str(current_user.id):
-                existing_trip.itinerary = [
+        version = await _update_owned_trip(
+            draft.id,
+            current_user,
+            request.expected_version,
+            {
+                Trip.itinerary: [
                     step.model_dump() for step in optimized_plan.itinerary_steps
-                ]
-                # Ensure total_itinerary_cost_usd is updated safely
-                if existing_trip.estimated_costs is None:
-                    existing_trip.estimated_costs = {}
-                existing_trip.estimated_costs["total_itinerary_cost_usd"] = (
-                    optimized_plan.total_estimated_cost_usd
-                )
-                existing_trip.updated_at = datetime.utcnow()
-                await existing_trip.save()
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Trip not found or unauthorized.",
-                )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Trip ID is required for itinerary optimization.",
-            )
+                ],
+                "estimated_costs.total_itinerary_cost_usd": optimized_plan.total_estimated_cost_usd,
+                Trip.status: "planned",
+            },
+        )
 
-        return optimized_plan
+        return {**optimized_plan.model_dump(), "trip_id": str(draft.id), "version": version}
+    except HTTPException:
+        raise
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"},
+        )
     except Exception as e:
         print(f"Error in optimize itinerary endpoint: {e}")
         raise HTTPException(
@@ -275,10 +461,198 @@ async def optimize_and_confirm_itinerary(
         )
 
 
-@router.get("/trips", response_model=List[Trip])
-async def get_saved_trips(current_user: User = Depends(get_current_user)):
-    """Retrieve all saved trips for the current user."""
-    # Beanie returns Pydantic models which are automatically converted to dicts by FastAPI
-    trips = await Trip.find(Trip.user_id == str(current_user.id)).to_list()
-    # Manual conversion of ObjectId to string for consistency if needed, but Beanie handles it
-    return trips
+def _encode_trips_cursor(summary: TripSummary) -> str:
+    """Opaque position after `summary` in the newest-first (created_at, _id) order."""
+    raw = json.dumps({"created_at": summary.created_at.isoformat(), "id": summary.id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_trips_cursor(cursor: str) -> Tuple[datetime, PydanticObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["created_at"]), PydanticObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+        )
+
+
+@router.get("/trips", response_model=TripListResponse)
+async def get_saved_trips(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page."),
+    limit: int = Query(
+        settings.TRIPS_PAGE_DEFAULT_SIZE, ge=1, le=settings.TRIPS_PAGE_MAX_SIZE
+    ),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    One page of the current user's trips, newest first, as summaries. Use
+    GET /trips/{trip_id} for the full trip.
+    """
+    filters = [Trip.user_id == str(current_user.id)]
+    if cursor:
+        created_at, last_id = _decode_trips_cursor(cursor)
+        filters.append(
+            Or(
+                Trip.created_at < created_at,
+                And(Trip.created_at == created_at, Trip.id < last_id),
+            )
+        )
+    # One extra row tells us whether there is a next page
+    trips = (
+        await Trip.find(*filters)
+        .sort(-Trip.created_at, -Trip.id)
+        .limit(limit + 1)
+        .project(TripSummary)
+        .to_list()
+    )
+    next_cursor = _encode_trips_cursor(trips[limit - 1]) if len(trips) > limit else None
+    return TripListResponse(trips=trips[:limit], next_cursor=next_cursor)
+
+
+# Top-level Trip fields an export may select; _id is always included, as "id". An explicit
+# allowlist, so internal fields added to Trip later (e.g. plan_results) don't leak into exports
+EXPORT_FIELDS = [
+    "user_id",
+    "destination",
+    "trip_date",
+    "return_time",
+    "preferences",
+    "selected_locations",
+    "itinerary",
+    "estimated_costs",
+    "weather_info",
+    "travel_tips",
+    "status",
+    "version",
+    "created_at",
+    "updated_at",
+]
+
+
+def _parse_export_date(value: Optional[str], name: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {name}. Use YYYY-MM-DD.",
+        )
+
+
+def _export_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)  # ObjectId and anything else BSON-specific
+
+
+@router.get("/trips/export")
+async def export_trips(
+    from_date: Optional[str] = Query(None, description="Earliest trip date, YYYY-MM-DD (inclusive)."),
+    to_date: Optional[str] = Query(None, description="Latest trip date, YYYY-MM-DD (inclusive)."),
+    fields: Optional[str] = Query(
+        None, description=f"Comma-separated fields to include. Default: all of {', '.join(EXPORT_FIELDS)}."
+    ),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Streams the current user's trips as newline-delimited JSON, latest trip date first.
+    Documents are read from the cursor in batches of TRIPS_EXPORT_BATCH_SIZE and written
+    out batch by batch, so memory stays flat however many trips there are.
+    """
+    selected = EXPORT_FIELDS
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = sorted(set(selected) - set(EXPORT_FIELDS))
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown export fields: {', '.join(unknown)}.",
+            )
+
+    query: Dict[str, Any] = {"user_id": str(current_user.id)}
+    start = _parse_export_date(from_date, "from_date")
+    end = _parse_export_date(to_date, "to_date")
+    if start or end:
+        query["trip_date"] = {}
+        if start:
+            query["trip_date"]["$gte"] = start
+        if end:
+            query["trip_date"]["$lt"] = end + timedelta(days=1)
+
+    async def ndjson_lines() -> AsyncIterator[str]:
+        batch_size = settings.TRIPS_EXPORT_BATCH_SIZE
+        # Served by the (user_id, trip_date) index, so the server never sorts in memory
+        cursor = (
+            Trip.get_motor_collection()
+            .find(query, {field: 1 for field in selected})
+            .sort("trip_date", DESCENDING)
+            .batch_size(batch_size)
+        )
+        lines: List[str] = []
+        try:
+            async for document in cursor:
+                row = {"id": str(document.pop("_id")), **document}
+                lines.append(json.dumps(row, default=_export_default) + "\n")
+                if len(lines) >= batch_size:
+                    yield "".join(lines)
+                    lines = []
+            if lines:
+                yield "".join(lines)
+        finally:
+            await cursor.close()
+
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="trips.ndjson"'},
+    )
+
+
+@router.get("/trips/{trip_id}", response_model=Trip)
+async def get_saved_trip(
+    trip_id: str,
+    include_weather_snapshot: bool = Query(
+        False, description="Also return the raw forecast slot as weather_info.raw_weather_data."
+    ),
+    current_user: User = Depends(get_current_user),
+):
+    """Retrieve one of the current user's trips in full."""
+    trip = None
+    if PydanticObjectId.is_valid(trip_id):
+        trip = await Trip.find_one(
+            Trip.id == PydanticObjectId(trip_id), Trip.user_id == str(current_user.id)
+        )
+    if not trip:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trip not found or unauthorized.",
+        )
+    snapshot_key = trip.weather_info.get("snapshot_key")
+    if include_weather_snapshot and snapshot_key:
+        slot = await weather_snapshots.load(snapshot_key)
+        if slot is not None:
+            # Same shape as trips saved before snapshots were split out
+            trip.weather_info["raw_weather_data"] = {
+                **trip.weather_info.get("forecast", {}),
+                "raw_data": slot,
+            }
+    return trip
+
+
+@router.get("/gemini/stats", response_model=Dict[str, Dict[str, Any]])
+async def get_gemini_stats(current_user: User = Depends(get_current_user)):
+    """
+    Limiter, per-tier latency, response cache, JSON parse and plan precompute
+    counters for Gemini calls in this worker.
+    """
+    return {
+        "limiter": get_gemini_limiter_stats(),
+        "tiers": get_gemini_tier_stats(),
+        "cache": get_gemini_cache_stats(),
+        "json_parse": get_json_parse_stats(),
+        "plan_precompute": get_plan_precompute_stats(),
+    }
@@ -3,9 +3,11 @@ from pydantic import BaseModel, Field
 from typing import List, Literal, Dict, Any
 from app.models.user import User
 from app.models.preferences import UserPreferences
+from app.services.preferences_store import PreferencesStore
 from app.utils.auth_utils import get_current_user
 
 router = APIRouter()
+preferences_store = PreferencesStore()
 
 
 class UserPreferencesCreateUpdate(BaseModel):
@@ -28,16 +30,8 @@ class UserPreferencesCreateUpdate(BaseModel):
 
 @router.get("/preferences", response_model=UserPreferences)
 async def get_user_preferences(current_user: User = Depends(get_current_user)):
-    """Retrieve user's trip preferences."""
-    preferences = await UserPreferences.find_one(
-        UserPreferences.user_id == str(current_user.id)
-    )
-    if not preferences:
-        # Create default preferences if none exist
-        default_prefs = UserPreferences(user_id=str(current_user.id))
-        await default_prefs.insert()
-        return default_prefs
-    return preferences
+    """Retrieve user's trip preferences, creating the defaults if none exist."""
+    return await preferences_store.get(str(current_user.id))
 
 
 @router.post(
@@ -47,17 +41,12 @@ async def create_user_preferences(
     prefs: UserPreferencesCreateUpdate, current_user: User = Depends(get_current_user)
 ):
     """Create user's trip preferences (if they don't exist)."""
-    existing_prefs = await UserPreferences.find_one(
-        UserPreferences.user_id == str(current_user.id)
-    )
-    if existing_prefs:
+    new_prefs = await preferences_store.create(str(current_user.id), prefs.model_dump())
+    if new_prefs is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Preferences already exist for this user. Use PUT to update.",
         )
-
-    new_prefs = UserPreferences(user_id=str(current_user.id), **prefs.model_dump())
-    await new_prefs.insert()
     return new_prefs
 
 
@@ -66,20 +55,10 @@ async def update_user_preferences(
     prefs: UserPreferencesCreateUpdate, current_user: User = Depends(get_current_user)
 ):
     """Update user's trip preferences."""
-    existing_prefs = await UserPreferences.find_one(
-        UserPreferences.user_id == str(current_user.id)
-    )
-    if not existing_prefs:
+    updated_prefs = await preferences_store.update(str(current_user.id), prefs.model_dump())
+    if updated_prefs is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Preferences not found for this user. Use POST to create.",
         )
-
-    # Update fields
-    existing_prefs.interests = prefs.interests
-    existing_prefs.pace = prefs.pace
-    existing_prefs.preferred_transport = prefs.preferred_transport
-    existing_prefs.budget_range = prefs.budget_range
-
-    await existing_prefs.save()
-    return existing_prefs
+    return updated_prefs
@@ -0,0 +1,130 @@
+import json
+from typing import Any, Dict, Optional, Type
+
+from google.generativeai.types import GenerationConfig
+from google.generativeai.types.generation_types import to_generation_config_dict
+from pydantic import BaseModel
+
+from app.models.gemini_models import (
+    InitialTripSuggestions,
+    ItineraryNotes,
+    OptimizedItinerary,
+    TripPlanningAnalysis,
+)
+
+JSON_MIME_TYPE = "application/json"
+
+
+class _UnsupportedSchema(Exception):
+    """The model uses a construct Gemini's response_schema cannot express."""
+
+
+def _to_response_schema(node: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts a pydantic JSON schema node into the OpenAPI subset accepted by
+    Gemini's response_schema: refs inlined, Optional[X] as nullable, no titles/defaults.
+    """
+    if "$ref" in node:
+        return _to_response_schema(defs[node["$ref"].split("/")[-1]], defs)
+
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        if len(options) != 1:
+            raise _UnsupportedSchema("unions other than Optional[...]")
+        converted = _to_response_schema(options[0], defs)
+        converted["nullable"] = True
+        if "description" in node:
+            converted["description"] = node["description"]
+        return converted
+
+    out: Dict[str, Any] = {}
+    if "const" in node:
+        out["type"] = "string"
+        out["enum"] = [node["const"]]
+    else:
+        schema_type = node.get("type")
+        if schema_type == "object":
+            properties = node.get("properties")
+            if not properties:
+                # Free-form dicts (Dict[str, Any]) have no properties to declare
+                raise _UnsupportedSchema("free-form object")
+            out["type"] = "object"
+            out["properties"] = {
+                name: _to_response_schema(value, defs)
+                for name, value in properties.items()
+            }
+            if node.get("required"):
+                out["required"] = list(node["required"])
+        elif schema_type == "array":
+            out["type"] = "array"
+            out["items"] = _to_response_schema(node.get("items", {}), defs)
+        elif schema_type in ("string", "integer", "number", "boolean"):
+            out["type"] = schema_type
+            if "enum" in node:
+                out["enum"] = list(node["enum"])
+        else:
+            raise _UnsupportedSchema(f"type {schema_type!r}")
+
+    if "description" in node:
+        out["description"] = node["description"]
+    return out
+
+
+def _strip_titles(node: Any) -> Any:
+    """Drops pydantic's auto-generated titles, which only add prompt tokens."""
+    if isinstance(node, dict):
+        return {k: _strip_titles(v) for k, v in node.items() if k != "title"}
+    if isinstance(node, list):
+        return [_strip_titles(v) for v in node]
+    return node
+
+
+class StructuredOutput:
+    """
+    Precompiled structured-output settings for one response model.
+    When the model can be expressed as a Gemini response_schema, the schema is
+    passed natively through the generation config and no schema text goes into
+    the prompt. Otherwise JSON mode is still enforced and a compact
+    (whitespace-free, untitled) schema is appended to the prompt instead.
+    """
+
+    def __init__(self, output_model: Type[BaseModel]):
+        self.output_model = output_model
+        json_schema = output_model.model_json_schema()
+        self.compact_schema = json.dumps(
+            _strip_titles(json_schema), separators=(",", ":")
+        )
+        try:
+            response_schema: Optional[Dict[str, Any]] = _to_response_schema(
+                json_schema, json_schema.get("$defs", {})
+            )
+        except _UnsupportedSchema:
+            # e.g. TripPlanningAnalysis has a free-form dict; such models use plain JSON mode
+            # with the schema in the prompt (self.native is False)
+            response_schema = None
+        self.native = response_schema is not None
+        # Normalized to protos once here, so the SDK does no schema work per call
+        self.generation_config = to_generation_config_dict(
+            GenerationConfig(
+                response_mime_type=JSON_MIME_TYPE, response_schema=response_schema
+            )
+        )
+
+
+_structured_outputs: Dict[Type[BaseModel], StructuredOutput] = {
+    model: StructuredOutput(model)
+    for model in (
+        InitialTripSuggestions,
+        TripPlanningAnalysis,
+        OptimizedItinerary,
+        ItineraryNotes,
+    )
+}
+
+
+def structured_output_for(output_model: Type[BaseModel]) -> StructuredOutput:
+    """Returns the precompiled settings for a response model, compiling unknown models once."""
+    compiled = _structured_outputs.get(output_model)
+    if compiled is None:
+        compiled = _structured_outputs[output_model] = StructuredOutput(output_model)
+    return compiled
@@ -2,159 +2,299 @@ from click import prompt
 import google.generativeai as genai
 from google.generativeai.types import Tool  # This should now be found by 0.7.0
 from app.config import settings
+from app.models.gemini_cache import GeminiResponseCacheEntry
+from app.services.gemini_schemas import structured_output_for
+from app.services.gemini_tiers import GeminiModelPolicy
+from app.utils.cache import SingleFlight, TTLCache
+from app.utils.concurrency import ConcurrencyLimiter, ServiceOverloadedError
+from app.utils.json_repair import parse_llm_json, unwrap_schema_values
+from app.utils.json_stream import ITEM_EVENT, StreamingJSONObjectParser
 from app.models.gemini_models import (
     InitialTripSuggestions,
+    ItineraryNotes,
     OptimizedItinerary,
     TripPlanningAnalysis,
     SuggestedLocation,
     OptimizedItineraryStep,
 )
-from typing import List, Dict, Any, Literal
+from typing import (
+    List,
+    Dict,
+    Any,
+    Literal,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Optional,
+    Tuple,
+    Type,
+)
+import hashlib
 import json
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 genai.configure(api_key=settings.GOOGLE_API_KEY)
 
+# Shared across GeminiService instances so the cap is per worker, not per router
+_gemini_limiter = ConcurrencyLimiter(
+    "Gemini",
+    max_concurrent=settings.GEMINI_MAX_CONCURRENT_REQUESTS,
+    max_queue=settings.GEMINI_MAX_QUEUE_DEPTH,
+)
+
+_model_policy = GeminiModelPolicy(_gemini_limiter)
+
+_response_cache = TTLCache(
+    max_entries=settings.GEMINI_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.GEMINI_CACHE_TTL_SECONDS,
+)
+_response_flights = SingleFlight()
+
+
+def get_gemini_limiter_stats() -> Dict[str, Any]:
+    return _gemini_limiter.stats()
+
+
+def get_gemini_tier_stats() -> Dict[str, Any]:
+    return _model_policy.stats()
+
+
+def get_gemini_cache_stats() -> Dict[str, int]:
+    stats = _response_cache.stats()
+    stats["coalesced"] = _response_flights.coalesced
+    return stats
+
+
+# --- Canonical forms of request inputs, used as response cache keys ---
+
+
+def _weather_bucket(weather_data: Dict[str, Any]) -> str:
+    """Coarse weather class (conditions, temperature to 5°F, rain flag) so near-identical forecasts share a key."""
+    temp = weather_data.get("temperature_f")
+    if temp is None:
+        return "unknown"
+    description = str(weather_data.get("description", "")).strip().lower()
+    rain = bool(weather_data.get("umbrella_recommended"))
+    return f"{description}|{int(round(float(temp) / 5.0) * 5)}|{rain}"
+
+
+def _canonical_city(city: str) -> str:
+    return " ".join(city.split()).lower()
+
+
+def _canonical_preferences(user_preferences: Dict[str, Any]) -> Dict[str, Any]:
+    """Sorts list-valued preferences so their order does not change the key."""
+    canonical = {}
+    for k, v in user_preferences.items():
+        if isinstance(v, (list, tuple, set)):
+            v = sorted(str(item) for item in v)
+        canonical[str(k)] = v
+    return canonical
+
+
+def _canonical_locations(selected_locations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keeps only the location fields that feed the prompts, sorted by name."""
+    fields = ("name", "type", "estimated_time_spent_minutes", "admission_cost_usd")
+    return sorted(
+        ({f: loc.get(f) for f in fields} for loc in selected_locations),
+        key=lambda loc: str(loc.get("name", "")).lower(),
+    )
+
+
+def _response_cache_key(operation: str, inputs: Dict[str, Any]) -> str:
+    canonical = json.dumps({"op": operation, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
 
 class GeminiService:
     def __init__(self):
-        self.generation_model = genai.GenerativeModel("gemini-1.5-pro-latest")
+        # Generation calls pick their model per operation through _model_policy
         self.vision_model = genai.GenerativeModel("gemini-pro-vision")
-        self.chat_model = genai.GenerativeModel("gemini-1.5-pro-latest")
+        self.chat_model = genai.GenerativeModel(settings.GEMINI_PRO_MODEL)
 
-    def _extract_values_from_schema_response(
-        self, response_data: Dict[str, Any]
-    ) -> Dict[str, Any]:
+    async def _cached_generate(
+        self,
+        operation: str,
+        inputs: Dict[str, Any],
+        output_model: Type[BaseModel],
+        generate: Callable[[], Awaitable[BaseModel]],
+    ):
         """
-        Extract actual values from Gemini's schema-style response format.
-        Converts from {"field": {"value": "actual_value"}} to {"field": "actual_value"}
+        Serves a response from the L1/L2 cache when the canonical inputs match,
+        otherwise runs `generate` (coalescing identical concurrent requests) and caches the result.
         """
-        if not isinstance(response_data, dict):
-            return response_data
-
-        # Check if this looks like a schema response (has "properties" key)
-        if "properties" in response_data:
-            extracted = {}
-            properties = response_data["properties"]
-
-            for field_name, field_data in properties.items():
-                if isinstance(field_data, dict) and "value" in field_data:
-                    extracted[field_name] = field_data["value"]
-                else:
-                    # Fallback for fields that don't have the schema format
-                    extracted[field_name] = field_data
-
-            return extracted
-
-        # If it's not a schema response, return as-is
-        return response_data
+        if not settings.GEMINI_CACHE_ENABLED:
+            return await generate()
+
+        key = _response_cache_key(operation, inputs)
+        payload = await self._cache_lookup(key, operation)
+        if payload is not None:
+            return output_model.model_validate(payload)
+
+        async def produce() -> Dict[str, Any]:
+            result = await generate()
+            produced = result.model_dump()
+            await self._cache_store(key, operation, produced)
+            return produced
+
+        payload = await _response_flights.do(key, produce)
+        # Validate per caller so no two requests share (and mutate) the same model instance
+        return output_model.model_validate(payload)
+
+    async def _cache_lookup(self, key: str, operation: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached payload from L1, falling back to (and promoting from) L2."""
+        payload = _response_cache.get(key)
+        if payload is None:
+            payload = await self._read_shared_cache(key)
+            if payload is not None:
+                _response_cache.set(key, payload)
+        if payload is not None:
+            print(f"GeminiService: Cache hit for {operation}")
+        return payload
+
+    async def _cache_store(
+        self, key: str, operation: str, payload: Dict[str, Any]
+    ) -> None:
+        _response_cache.set(key, payload)
+        await self._write_shared_cache(key, operation, payload)
+
+    async def _read_shared_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        if not settings.GEMINI_CACHE_L2_ENABLED:
+            return None
+        try:
+            entry = await GeminiResponseCacheEntry.find_one(
+                GeminiResponseCacheEntry.key == key
+            )
+        except Exception as e:
+            print(f"GeminiService: Shared cache read failed: {e}")
+            return None
+        return entry.response if entry else None
+
+    async def _write_shared_cache(
+        self, key: str, operation: str, payload: Dict[str, Any]
+    ) -> None:
+        if not settings.GEMINI_CACHE_L2_ENABLED:
+            return
+        try:
+            await GeminiResponseCacheEntry.find_one(
+                GeminiResponseCacheEntry.key == key
+            ).upsert(
+                {"$set": {"response": payload, "created_at": datetime.utcnow()}},
+                on_insert=GeminiResponseCacheEntry(
+                    key=key, operation=operation, response=payload
+                ),
+            )
+        except Exception as e:
+            print(f"GeminiService: Shared cache write failed: {e}")
 
     async def _generate_content_with_tools(
-        self, prompt: str, output_model: BaseModel, tools: List[Tool] = None
+        self,
+        prompt: str,
+        output_model: BaseModel,
+        tools: List[Tool] = None,
+        operation: str = "tools",
     ):
         """Helper to generate content with tools and parse output into a Pydantic model."""
-        try:
-            tool_config_param = (
-                {"function_calling_config": {"mode": "AUTO"}} if tools else None
-            )
+        tool_config_param = (
+            {"function_calling_config": {"mode": "AUTO"}} if tools else None
+        )
 
-            response = self.generation_model.generate_content(
+        async def attempt(model: genai.GenerativeModel):
+            response = await model.generate_content_async(
                 prompt,
                 tools=tools,
                 tool_config=tool_config_param,
             )
-
             content_text = response.text  # This should not cause an await error
             print(
                 f"Attempting to parse JSON for {output_model.__name__}:\n{content_text}"
             )
+            try:
+                # Tool-calling responses are not JSON-mode, so they need the tolerant parser most
+                parsed_data = unwrap_schema_values(parse_llm_json(content_text))
+                return output_model.model_validate(parsed_data)
+            except Exception:
+                print(f"Raw response text (may not be valid JSON): {content_text}")
+                raise
 
-            # Parse JSON and extract values if it's a schema response
-            parsed_data = json.loads(content_text)
-            extracted_data = self._extract_values_from_schema_response(parsed_data)
-
-            return output_model.model_validate(extracted_data)
+        try:
+            return await _model_policy.run(operation, attempt)
+        except ServiceOverloadedError:
+            raise
         except Exception as e:
             print(
                 f"Error generating content with tools for {output_model.__name__}: {e}"
             )
             print(f"Prompt that failed: {prompt}")
-            if "response" in locals() and hasattr(response, "text"):
-                print(f"Raw response text (may not be valid JSON): {response.text}")
             raise
 
     async def _generate_content_with_json_parsing(
-        self, prompt: str, output_model: BaseModel
+        self, prompt: str, output_model: BaseModel, operation: str
     ):
-        """Helper to generate content with JSON parsing and parse output into a Pydantic model."""
-        try:
-            # Add JSON schema and format instructions to the prompt
-            json_schema = output_model.model_json_schema()
-            enhanced_prompt = f"""
-{prompt}
-
-Please respond with a valid JSON object that matches this exact schema:
-{json.dumps(json_schema, indent=2)}
-
-IMPORTANT: 
-- Your response must be valid JSON only, with no additional text or formatting.
-- Do not include schema definitions or metadata.
-- Return only the actual field values, not wrapped in "value" properties.
-- For example, return {{"weather_summary": "Sunny and warm"}} not {{"weather_summary": {{"value": "Sunny and warm"}}}}
-
-Example of correct format:
-{{
-  "weather_summary": "Sunny with temperatures around 75°F",
-  "clothing_suggestion": "Light clothing recommended",
-  "carry_umbrella": false,
-  "general_money_tips": "Consider purchasing a city pass",
-  "transportation_tips": "Use public transit",
-  "other_carry_items": ["sunscreen", "water bottle"],
-  "location_info": [{{"name": "Example Location", "typical_hours": "9 AM - 5 PM", "quick_fact": "Famous for..."}}]
-}}
-"""
-
-            response = self.generation_model.generate_content(enhanced_prompt)
-            content_text = response.text.strip()
-
-            # Clean up the response in case there's extra formatting
-            if content_text.startswith("```json"):
-                content_text = content_text[7:]  # Remove ```json
-            if content_text.endswith("```"):
-                content_text = content_text[:-3]  # Remove ```
-            content_text = content_text.strip()
+        """
+        Helper to generate content with JSON parsing and parse output into a Pydantic model.
+        The model tier, deadline and hedging come from the operation's policy.
+        """
+        enhanced_prompt = self._build_json_prompt(prompt, output_model)
+        generation_config = structured_output_for(output_model).generation_config
 
-            print(
-                f"Attempting to parse JSON for {output_model.__name__}:\n{content_text}"
+        async def attempt(model: genai.GenerativeModel):
+            response = await model.generate_content_async(
+                enhanced_prompt, generation_config=generation_config
             )
+            content_text = response.text
+            try:
+                return self._parse_json_response(content_text, output_model)
+            except json.JSONDecodeError as e:
+                print(f"JSON decode error for {output_model.__name__}: {e}")
+                print(f"Raw response text: {content_text}")  # <--- Keep this active
+                raise
 
-            # Parse JSON and extract values if it's a schema response
-            parsed_data = json.loads(content_text)
-            extracted_data = self._extract_values_from_schema_response(parsed_data)
-
-            return output_model.model_validate(extracted_data)
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error for {output_model.__name__}: {e}")
-            print(f"Raw response text: {content_text}")  # <--- Keep this active
+        try:
+            return await _model_policy.run(operation, attempt)
+        except ServiceOverloadedError:
             raise
         except Exception as e:
             print(
                 f"Error generating content with JSON parsing for {output_model.__name__}: {e}"
             )
             print(f"Prompt that failed: {prompt}")
-            if "response" in locals() and hasattr(response, "text"):
-                print(f"Raw response text: {response.text}")  # <--- Keep this active
             raise
 
-    async def get_initial_trip_suggestions(
+    def _build_json_prompt(self, prompt: str, output_model: Type[BaseModel]) -> str:
+        """
+        Adds JSON output instructions to the prompt. The schema itself travels in the
+        generation config; only models Gemini cannot express natively get the compact
+        schema appended here.
+        """
+        structured = structured_output_for(output_model)
+        if structured.native:
+            return prompt
+        return (
+            f"{prompt}\n\n"
+            f"Respond with a JSON object matching this JSON schema. "
+            f"Return only the field values, not the schema itself:\n"
+            f"{structured.compact_schema}"
+        )
+
+    def _parse_json_response(self, content_text: str, output_model: Type[BaseModel]):
+        """Parses a JSON-mode model response into the output model."""
+        print(f"Attempting to parse JSON for {output_model.__name__}:\n{content_text}")
+
+        # Recovers prose-wrapped, truncated or slightly malformed JSON instead of failing
+        parsed_data = unwrap_schema_values(parse_llm_json(content_text))
+
+        return output_model.model_validate(parsed_data)
+
+    def _build_initial_suggestions_prompt(
         self,
         city: str,
         interests: List[str],
         pace: Literal["fast-paced", "relaxed"],
         trip_date: datetime,
         weather_data: Dict[str, Any],
-    ) -> InitialTripSuggestions:
+    ) -> str:
         formatted_date = trip_date.strftime("%A, %B %d, %Y")
         current_time_str = datetime.now().strftime("%I:%M %p %Z")
         weather_summary_for_gemini = weather_data.get(
@@ -174,10 +314,111 @@ Example of correct format:
             f"Also, give general weather and clothing advice for that day based on the provided weather data, "
             f"and indicate if an umbrella or rain gear is recommended."
         )
+        return prompt
 
-        return await self._generate_content_with_json_parsing(
-            prompt, output_model=InitialTripSuggestions
+    def _initial_suggestions_cache_inputs(
+        self,
+        city: str,
+        interests: List[str],
+        pace: Literal["fast-paced", "relaxed"],
+        trip_date: datetime,
+        weather_data: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        return {
+            "city": _canonical_city(city),
+            "interests": sorted(interests),
+            "pace": pace,
+            "date": trip_date.strftime("%Y-%m-%d"),
+            "weather": _weather_bucket(weather_data),
+        }
+
+    async def get_initial_trip_suggestions(
+        self,
+        city: str,
+        interests: List[str],
+        pace: Literal["fast-paced", "relaxed"],
+        trip_date: datetime,
+        weather_data: Dict[str, Any],
+    ) -> InitialTripSuggestions:
+        prompt = self._build_initial_suggestions_prompt(
+            city, interests, pace, trip_date, weather_data
+        )
+        return await self._cached_generate(
+            "initial_trip_suggestions",
+            self._initial_suggestions_cache_inputs(
+                city, interests, pace, trip_date, weather_data
+            ),
+            InitialTripSuggestions,
+            lambda: self._generate_content_with_json_parsing(
+                prompt, output_model=InitialTripSuggestions, operation="initial_trip_suggestions"
+            ),
+        )
+
+    async def stream_initial_trip_suggestions(
+        self,
+        city: str,
+        interests: List[str],
+        pace: Literal["fast-paced", "relaxed"],
+        trip_date: datetime,
+        weather_data: Dict[str, Any],
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of get_initial_trip_suggestions. Yields events as soon as
+        they are complete in the model output:
+          ("field", (name, value)) for the top-level advice fields,
+          ("location", SuggestedLocation) for each suggested location,
+          ("complete", InitialTripSuggestions) once the whole response has been validated.
+        """
+        operation = "initial_trip_suggestions"
+        cache_key = _response_cache_key(
+            operation,
+            self._initial_suggestions_cache_inputs(
+                city, interests, pace, trip_date, weather_data
+            ),
+        )
+        if settings.GEMINI_CACHE_ENABLED:
+            payload = await self._cache_lookup(cache_key, operation)
+            if payload is not None:
+                suggestions = InitialTripSuggestions.model_validate(payload)
+                for name in ("general_weather_advice", "clothing_suggestion", "umbrella_needed"):
+                    yield "field", (name, getattr(suggestions, name))
+                for location in suggestions.location_suggestions:
+                    yield "location", location
+                yield "complete", suggestions
+                return
+
+        prompt = self._build_json_prompt(
+            self._build_initial_suggestions_prompt(
+                city, interests, pace, trip_date, weather_data
+            ),
+            InitialTripSuggestions,
+        )
+        parser = StreamingJSONObjectParser(stream_arrays=["location_suggestions"])
+        generation_config = structured_output_for(InitialTripSuggestions).generation_config
+        chunks = _model_policy.stream(
+            operation,
+            lambda model: model.generate_content_async(
+                prompt, generation_config=generation_config, stream=True
+            ),
         )
+        async for chunk in chunks:
+            for kind, key, value in parser.feed(chunk.text):
+                if kind == ITEM_EVENT:
+                    try:
+                        yield "location", SuggestedLocation.model_validate(
+                            unwrap_schema_values(value)
+                        )
+                    except ValidationError as e:
+                        # Still reported through the final, full validation below
+                        print(f"GeminiService: Skipping malformed streamed location: {e}")
+                elif key != "location_suggestions":
+                    yield "field", (key, value)
+
+        # The full text, so a truncated stream can still be repaired
+        suggestions = self._parse_json_response(parser.text, InitialTripSuggestions)
+        if settings.GEMINI_CACHE_ENABLED:
+            await self._cache_store(cache_key, operation, suggestions.model_dump())
+        yield "complete", suggestions
 
     async def get_detailed_trip_analysis(
         self,
@@ -223,8 +464,20 @@ Example of correct format:
             f"and a quick fact or two, based on common knowledge for these well-known Chicago spots."
         )
 
-        return await self._generate_content_with_json_parsing(
-            prompt, output_model=TripPlanningAnalysis
+        return await self._cached_generate(
+            "detailed_trip_analysis",
+            {
+                "city": _canonical_city(city),
+                "date": trip_date.strftime("%Y-%m-%d"),
+                "return_time": return_time.strip().upper(),
+                "locations": _canonical_locations(selected_locations),
+                "preferences": _canonical_preferences(user_preferences),
+                "weather": _weather_bucket(weather_data),
+            },
+            TripPlanningAnalysis,
+            lambda: self._generate_content_with_json_parsing(
+                prompt, output_model=TripPlanningAnalysis, operation="detailed_trip_analysis"
+            ),
         )
 
     async def optimize_itinerary(
@@ -266,6 +519,54 @@ Example of correct format:
             f"Finally, calculate the total estimated travel time (sum of all estimated_travel_time_minutes) and total activity time (sum of all estimated_time_spent_minutes) for the day."
         )
 
-        return await self._generate_content_with_json_parsing(
-            prompt, output_model=OptimizedItinerary
+        return await self._cached_generate(
+            "optimize_itinerary",
+            {
+                "city": _canonical_city(city),
+                "date": trip_date.strftime("%Y-%m-%d"),
+                "return_time": return_time.strip().upper(),
+                "locations": _canonical_locations(selected_locations),
+                "preferences": _canonical_preferences(user_preferences),
+            },
+            OptimizedItinerary,
+            lambda: self._generate_content_with_json_parsing(
+                prompt, output_model=OptimizedItinerary, operation="optimize_itinerary"
+            ),
+        )
+
+    async def write_itinerary_notes(
+        self, city: str, trip_date: datetime, itinerary: OptimizedItinerary
+    ) -> ItineraryNotes:
+        """
+        Asks Gemini for short tips on an already scheduled itinerary. Only text is
+        generated here; ordering, times and totals come from the local scheduler.
+        """
+        formatted_date = trip_date.strftime("%A, %B %d, %Y")
+        steps_str = "\n".join(
+            f"{i + 1}. {step.start_time}-{step.end_time} {step.activity} ({step.location_name})"
+            for i, step in enumerate(itinerary.itinerary_steps)
+        )
+        prompt = (
+            f"You are an AI travel planning companion. This is a fixed 1-day itinerary in {city} "
+            f"on {formatted_date}:\n{steps_str}\n"
+            f"Do not change the order or times. For each step, write one short practical tip "
+            f"(e.g., 'Buy tickets online', 'Try the deep-dish pizza'), or an empty string if none. "
+            f"Then give one or two sentences of overall advice. "
+            f"The plan was assessed as '{itinerary.feasibility_status}'."
+        )
+
+        return await self._cached_generate(
+            "itinerary_notes",
+            {
+                "city": _canonical_city(city),
+                "date": trip_date.strftime("%Y-%m-%d"),
+                "steps": [
+                    [step.start_time, step.activity] for step in itinerary.itinerary_steps
+                ],
+                "feasibility": itinerary.feasibility_status,
+            },
+            ItineraryNotes,
+            lambda: self._generate_content_with_json_parsing(
+                prompt, output_model=ItineraryNotes, operation="itinerary_notes"
+            ),
         )
@@ -0,0 +1,261 @@
+import asyncio
+import math
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import google.generativeai as genai
+
+from app.config import settings
+from app.utils.concurrency import ConcurrencyLimiter, ServiceOverloadedError
+
+T = TypeVar("T")
+
+FAST_TIER = "fast"
+PRO_TIER = "pro"
+# Where an operation goes when its own tier is too slow; the fast tier has nowhere to go
+FASTER_TIER = {PRO_TIER: FAST_TIER}
+
+_TIMEOUT = "timeout"  # Cancellation message used when an attempt runs past its deadline
+
+
+class GeminiTimeoutError(ServiceOverloadedError):
+    """No model tier answered within the operation's deadline. Surfaced to clients like an overload (503)."""
+
+
+class LatencyTracker:
+    """Recent latencies (successful and timed-out attempts) plus outcome counts for one operation/tier."""
+
+    def __init__(self, window: int):
+        self._samples: deque = deque(maxlen=window)
+        self.outcomes: Counter = Counter()
+
+    def record(self, outcome: str, seconds: Optional[float] = None) -> None:
+        self.outcomes[outcome] += 1
+        if seconds is not None:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(p: float) -> Optional[float]:
+            value = self.percentile(p)
+            return None if value is None else round(1000 * value, 1)
+
+        return {
+            "samples": len(self._samples),
+            "p50_ms": ms(50),
+            "p95_ms": ms(95),
+            "p99_ms": ms(99),
+            "outcomes": dict(self.outcomes),
+        }
+
+
+class GeminiModelPolicy:
+    """
+    Routes each Gemini operation to a model tier (GEMINI_OPERATION_TIERS), enforces
+    the operation's deadline, hedges slow pro-tier calls with a fast-tier request
+    once they exceed the observed latency percentile, and falls back to the fast
+    tier when the pro tier times out. Every attempt holds a limiter slot.
+    """
+
+    def __init__(self, limiter: ConcurrencyLimiter):
+        self.limiter = limiter
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        self._trackers: Dict[Tuple[str, str], LatencyTracker] = {}
+        self._operation_counters: Dict[str, Counter] = defaultdict(Counter)
+
+    def model(self, tier: str) -> genai.GenerativeModel:
+        if tier not in self._models:
+            name = settings.GEMINI_FAST_MODEL if tier == FAST_TIER else settings.GEMINI_PRO_MODEL
+            self._models[tier] = genai.GenerativeModel(name)
+        return self._models[tier]
+
+    def tier_for(self, operation: str) -> str:
+        return settings.GEMINI_OPERATION_TIERS.get(operation, settings.GEMINI_DEFAULT_TIER)
+
+    def deadline_for(self, operation: str) -> float:
+        return settings.GEMINI_OPERATION_DEADLINES_SECONDS.get(
+            operation, settings.GEMINI_DEFAULT_DEADLINE_SECONDS
+        )
+
+    def _tracker(self, operation: str, tier: str) -> LatencyTracker:
+        key = (operation, tier)
+        if key not in self._trackers:
+            self._trackers[key] = LatencyTracker(settings.GEMINI_LATENCY_WINDOW)
+        return self._trackers[key]
+
+    def _hedge_delay(self, operation: str, tier: str) -> Optional[float]:
+        """How long to wait before hedging, or None until there is enough latency history."""
+        if not settings.GEMINI_HEDGE_ENABLED or tier not in FASTER_TIER:
+            return None
+        tracker = self._tracker(operation, tier)
+        if len(tracker) < settings.GEMINI_HEDGE_MIN_SAMPLES:
+            return None
+        return max(
+            tracker.percentile(settings.GEMINI_HEDGE_PERCENTILE),
+            settings.GEMINI_HEDGE_MIN_DELAY_SECONDS,
+        )
+
+    async def _attempt(
+        self,
+        operation: str,
+        tier: str,
+        call: Callable[[genai.GenerativeModel], Awaitable[T]],
+    ) -> T:
+        tracker = self._tracker(operation, tier)
+        async with self.limiter.slot():
+            started = time.perf_counter()
+            try:
+                result = await call(self.model(tier))
+            except asyncio.CancelledError as e:
+                if e.args and e.args[0] == _TIMEOUT:
+                    tracker.record("timeout", time.perf_counter() - started)
+                else:
+                    tracker.record("cancelled")  # Lost a hedge race or the caller went away
+                raise
+            except Exception:
+                tracker.record("error")
+                raise
+        tracker.record("ok", time.perf_counter() - started)
+        return result
+
+    async def run(
+        self,
+        operation: str,
+        call: Callable[[genai.GenerativeModel], Awaitable[T]],
+    ) -> T:
+        """
+        Runs `call(model)` for the operation's tier and returns the first successful result.
+        `call` should include response parsing, so a malformed answer counts as a failed attempt.
+        """
+        loop = asyncio.get_running_loop()
+        counters = self._operation_counters[operation]
+        tier = self.tier_for(operation)
+        faster = FASTER_TIER.get(tier)
+        started = loop.time()
+        expires = started + self.deadline_for(operation)
+        hedge_at = None
+        hedge_delay = self._hedge_delay(operation, tier)
+        if hedge_delay is not None and started + hedge_delay < expires:
+            hedge_at = started + hedge_delay
+
+        tasks: Dict[asyncio.Task, str] = {
+            asyncio.create_task(self._attempt(operation, tier, call)): tier
+        }
+        tried = {tier}
+        first_error: Optional[BaseException] = None
+        cancel_reason: Optional[str] = None  # Attempts still running when we stop waiting
+        try:
+            while tasks:
+                now = loop.time()
+                if now >= expires:
+                    break
+                wake_at = expires if hedge_at is None else min(hedge_at, expires)
+                done, _ = await asyncio.wait(
+                    tasks, timeout=wake_at - now, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if hedge_at is not None and loop.time() >= hedge_at:
+                        hedge_at = None
+                        counters["hedged"] += 1
+                        tasks[asyncio.create_task(self._attempt(operation, faster, call))] = faster
+                        tried.add(faster)
+                    continue
+                for task in done:
+                    task_tier = tasks.pop(task)
+                    if task.exception() is None:
+                        if task_tier != tier:
+                            counters["hedge_won"] += 1
+                        return task.result()
+                    first_error = first_error or task.exception()
+                if not tasks:
+                    raise first_error
+            cancel_reason = _TIMEOUT
+        finally:
+            for task in tasks:
+                task.cancel(cancel_reason)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        if faster is None or faster in tried:
+            counters["timed_out"] += 1
+            raise GeminiTimeoutError(
+                f"Gemini did not answer '{operation}' within {self.deadline_for(operation):.0f}s. Please retry shortly."
+            )
+
+        # The pro tier ran out of time without a hedge; give the fast tier its own deadline
+        counters["fallback"] += 1
+        print(f"GeminiModelPolicy: '{operation}' timed out on the {tier} tier; falling back to {faster}.")
+        attempt = asyncio.create_task(self._attempt(operation, faster, call))
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(attempt), timeout=settings.GEMINI_FALLBACK_DEADLINE_SECONDS
+            )
+        except asyncio.TimeoutError:
+            attempt.cancel(_TIMEOUT)
+            await asyncio.gather(attempt, return_exceptions=True)
+            counters["timed_out"] += 1
+            raise GeminiTimeoutError(
+                f"Gemini did not answer '{operation}' in time on any tier. Please retry shortly."
+            )
+        finally:
+            if not attempt.done():
+                attempt.cancel()
+
+    async def stream(
+        self,
+        operation: str,
+        start: Callable[[genai.GenerativeModel], Awaitable[AsyncIterable[Any]]],
+    ) -> AsyncIterator[Any]:
+        """
+        Streams chunks for the operation's tier under its deadline. Streams are not hedged:
+        a second response cannot be merged into output the client has already received.
+        """
+        loop = asyncio.get_running_loop()
+        tier = self.tier_for(operation)
+        tracker = self._tracker(operation, tier)
+        async with self.limiter.slot():
+            started = loop.time()
+            expires = started + self.deadline_for(operation)
+            try:
+                response = await asyncio.wait_for(start(self.model(tier)), timeout=expires - loop.time())
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(
+                            chunks.__anext__(), timeout=max(0.0, expires - loop.time())
+                        )
+                    except StopAsyncIteration:
+                        break
+                    yield chunk
+            except asyncio.TimeoutError:
+                tracker.record("timeout", loop.time() - started)
+                self._operation_counters[operation]["timed_out"] += 1
+                raise GeminiTimeoutError(
+                    f"Gemini did not finish streaming '{operation}' within {self.deadline_for(operation):.0f}s."
+                )
+            except Exception:
+                tracker.record("error")
+                raise
+        tracker.record("ok", loop.time() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        operations: Dict[str, Any] = {}
+        for (operation, tier), tracker in self._trackers.items():
+            entry = operations.setdefault(
+                operation,
+                {"tier": self.tier_for(operation), "deadline_seconds": self.deadline_for(operation), "tiers": {}},
+            )
+            entry["tiers"][tier] = tracker.stats()
+        for operation, counters in self._operation_counters.items():
+            if operation in operations:
+                operations[operation].update(dict(counters))
+        return operations
@@ -0,0 +1,479 @@
+import asyncio
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.models.gemini_models import OptimizedItinerary, OptimizedItineraryStep
+from app.services.budget_calculator import BudgetCalculator
+from app.services.gemini_service import GeminiService
+from app.services.maps_routing_service import MapsRoutingService
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_RETURN_MINUTES = 22 * 60
+DEFAULT_TRAVEL_MINUTES = 15
+TIGHT_MARGIN_MINUTES = 60
+# A meal may start this early if the next activity would otherwise push it past its window
+MEAL_EARLY_SLACK_MINUTES = 60
+# (name, earliest start, latest start, duration), all in minutes after midnight
+MEALS: Tuple[Tuple[str, int, int, int], ...] = (
+    ("Lunch", 11 * 60 + 30, 14 * 60, 60),
+    ("Dinner", 17 * 60 + 30, 20 * 60 + 30, 75),
+)
+# Extra time per transition, on top of travel, by pace
+PACE_BUFFER_MINUTES = {"fast-paced": 5, "relaxed": 15}
+# Preference transport names -> OptimizedItineraryStep transport names
+STEP_TRANSPORT_MODES = {
+    "walking": "walk",
+    "public_transit": "public_transit",
+    "ride_share": "ride_share",
+    "driving": "drive",
+}
+
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_TIME_PATTERN = r"(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?\s*m?\.?"
+_TIME_RE = re.compile(rf"^\s*{_TIME_PATTERN}\s*$", re.IGNORECASE)
+_RANGE_RE = re.compile(
+    rf"{_TIME_PATTERN}\s*(?:-|–|—|to|until)\s*{_TIME_PATTERN}", re.IGNORECASE
+)
+
+
+def _to_minutes(hour: int, minute: int, meridiem: Optional[str]) -> Optional[int]:
+    if minute > 59 or hour > 24 or (meridiem and not 1 <= hour <= 12):
+        return None
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.lower() == "p" else 0)
+    return hour * 60 + minute
+
+
+def parse_clock_time(text: str) -> Optional[int]:
+    """Parses '11 PM', '9:30am', '23:00', 'noon' or 'midnight' into minutes after midnight."""
+    text = text.strip().lower()
+    if text == "noon":
+        return 12 * 60
+    if text == "midnight":
+        return MINUTES_PER_DAY
+    match = _TIME_RE.match(text)
+    if not match:
+        return None
+    hour, minute, meridiem = match.groups()
+    return _to_minutes(int(hour), int(minute or 0), meridiem)
+
+
+def _described_as_closed(text: str, weekday: Optional[str]) -> bool:
+    """'Closed' / 'Closed today' always count; 'Closed on Mondays' only on that weekday."""
+    if not text.startswith("closed"):
+        return False
+    days_named = [day for day in _WEEKDAYS if day in text]
+    return not days_named or (weekday is not None and weekday in days_named)
+
+
+def parse_operating_hours(
+    summary: Optional[str], weekday: Optional[str] = None
+) -> Optional[Tuple[int, int]]:
+    """
+    Extracts the (open, close) window in minutes from a free-text hours summary such as
+    '9:00 AM - 5:00 PM' or '10am to 6pm daily'. Unknown hours are unconstrained; a
+    place described as closed (on `weekday`, e.g. 'monday') gets None. Only the first
+    range is used.
+    """
+    if not summary:
+        return (0, MINUTES_PER_DAY)
+    text = summary.lower().replace("noon", "12 pm").replace("midnight", "12 am")
+    if "24 hours" in text or "24/7" in text:
+        return (0, MINUTES_PER_DAY)
+    match = _RANGE_RE.search(text)
+    if not match:
+        return None if _described_as_closed(text, weekday) else (0, MINUTES_PER_DAY)
+
+    open_hour, open_minute, open_meridiem, close_hour, close_minute, close_meridiem = (
+        match.groups()
+    )
+    if open_meridiem is None and close_meridiem is not None:
+        # '9-5 pm': the opening time shares the meridiem unless that would put it after closing
+        open_meridiem = close_meridiem
+        if int(open_hour) % 12 > int(close_hour) % 12:
+            open_meridiem = "a" if close_meridiem.lower() == "p" else "p"
+    opens = _to_minutes(int(open_hour), int(open_minute or 0), open_meridiem)
+    closes = _to_minutes(int(close_hour), int(close_minute or 0), close_meridiem)
+    if opens is None or closes is None:
+        return (0, MINUTES_PER_DAY)
+    if closes <= opens:
+        closes += MINUTES_PER_DAY  # Open past midnight
+    return (opens, closes)
+
+
+def format_clock_time(minutes: int) -> str:
+    """Formats minutes after midnight as '9:05 AM'."""
+    hour, minute = divmod(minutes % MINUTES_PER_DAY, 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+class _DayPlan:
+    """
+    The scheduling problem for one day: visit durations, opening windows and a travel
+    matrix, plus the deterministic rules for waiting, buffers and meal breaks.
+    All times are integer minutes after midnight.
+    """
+
+    def __init__(
+        self,
+        durations: List[int],
+        windows: List[Optional[Tuple[int, int]]],
+        travel: List[List[int]],
+        day_start: int,
+        return_by: int,
+        buffer: int,
+    ):
+        self.n = len(durations)
+        self.durations = durations
+        self.windows = [window or (0, 0) for window in windows]
+        self.travel = travel
+        self.day_start = day_start
+        self.return_by = return_by
+        self.buffer = buffer
+
+    def advance(
+        self, prev: Optional[int], j: int, t: int, meals: int
+    ) -> Tuple[int, int, int, Dict[str, Any]]:
+        """
+        Moves from the end of `prev` (or the start of the day) to the end of a visit to `j`.
+        Returns (end time, meals taken bitmask, 1 if the visit overruns closing, details).
+        """
+        travel = 0 if prev is None else self.travel[prev][j]
+        buffer = 0 if prev is None else self.buffer
+        meal_starts = []
+        if prev is not None:
+            for bit, (_, earliest, latest, duration) in enumerate(MEALS):
+                if meals & (1 << bit):
+                    continue
+                due = t >= earliest
+                squeezed = (
+                    t >= earliest - MEAL_EARLY_SLACK_MINUTES
+                    and t + buffer + travel + self.durations[j] > latest
+                )
+                if due or squeezed:
+                    meal_starts.append((bit, t))
+                    t += duration
+                    meals |= 1 << bit
+        arrive = t + buffer + travel
+        opens, closes = self.windows[j]
+        start = max(arrive, opens)
+        end = start + self.durations[j]
+        late = 1 if end > closes else 0
+        return end, meals, late, {"meals": meal_starts, "arrive": arrive, "start": start}
+
+    def finish(self, t: int, meals: int) -> Tuple[int, int, List[Tuple[int, int]]]:
+        """
+        Closes the day after the last visit: remaining meals are taken if they fit before
+        the return time. Returns (day end, 1 if past the return time, meal starts).
+        """
+        meal_starts = []
+        for bit, (_, earliest, latest, duration) in enumerate(MEALS):
+            if meals & (1 << bit):
+                continue
+            start = max(t, earliest)
+            if start <= latest and start + duration <= self.return_by:
+                meal_starts.append((bit, start))
+                t = start + duration
+        return t, 1 if t > self.return_by else 0, meal_starts
+
+    def evaluate(self, order: List[int]) -> Tuple[int, int]:
+        """(closing-time/return-time violations, day end) for a visiting order; lower is better."""
+        t, meals, violations, prev = self.day_start, 0, 0, None
+        for j in order:
+            t, meals, late, _ = self.advance(prev, j, t, meals)
+            violations += late
+            prev = j
+        day_end, late, _ = self.finish(t, meals)
+        return violations + late, day_end
+
+    def solve_exact(self) -> List[int]:
+        """
+        Held-Karp style DP over (visited set, last stop, meals taken), keeping the
+        fewest-violations-then-earliest state. Exponential; only for small days.
+        """
+        states: Dict[int, Dict[Tuple[int, int], Tuple[int, int, Optional[Tuple[int, int, int]]]]] = {}
+        for j in range(self.n):
+            t, meals, late, _ = self.advance(None, j, self.day_start, 0)
+            states.setdefault(1 << j, {})[(j, meals)] = (late, t, None)
+
+        for mask in range(1, 1 << self.n):
+            layer = states.get(mask)
+            if not layer:
+                continue
+            for (last, meals), (violations, t, _) in layer.items():
+                for j in range(self.n):
+                    if mask & (1 << j):
+                        continue
+                    end, new_meals, late, _ = self.advance(last, j, t, meals)
+                    candidate = (violations + late, end)
+                    next_layer = states.setdefault(mask | (1 << j), {})
+                    current = next_layer.get((j, new_meals))
+                    if current is None or candidate < current[:2]:
+                        next_layer[(j, new_meals)] = (*candidate, (mask, last, meals))
+
+        best_key, best_score = None, None
+        for (last, meals), (violations, t, _) in states[(1 << self.n) - 1].items():
+            day_end, late, _ = self.finish(t, meals)
+            score = (violations + late, day_end)
+            if best_score is None or score < best_score:
+                best_key, best_score = (last, meals), score
+
+        order = []
+        mask, key = (1 << self.n) - 1, best_key
+        while key is not None:
+            order.append(key[0])
+            parent = states[mask][key][2]
+            if parent is None:
+                break
+            mask, key = parent[0], (parent[1], parent[2])
+        order.reverse()
+        return order
+
+    def solve_greedy(self) -> List[int]:
+        """Earliest-feasible-next construction followed by 2-opt improvement."""
+        order: List[int] = []
+        remaining = set(range(self.n))
+        t, meals, prev = self.day_start, 0, None
+        while remaining:
+            candidates = []
+            for j in remaining:
+                end, new_meals, late, _ = self.advance(prev, j, t, meals)
+                candidates.append((late, end, j, new_meals))
+            _, t, best, meals = min(candidates)
+            order.append(best)
+            remaining.remove(best)
+            prev = best
+
+        best_score = self.evaluate(order)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(self.n - 1):
+                for k in range(i + 1, self.n):
+                    candidate = order[:i] + order[i : k + 1][::-1] + order[k + 1 :]
+                    score = self.evaluate(candidate)
+                    if score < best_score:
+                        order, best_score, improved = candidate, score, True
+        return order
+
+
+class ItineraryScheduler:
+    """
+    Builds OptimizedItinerary locally: orders the selected locations as a small
+    TSP with time windows (opening hours, meal breaks, return time), then derives
+    start/end times, totals and feasibility exactly. Gemini is only used, if
+    enabled, to add free-text notes.
+    """
+
+    def __init__(
+        self,
+        maps_routing_service: MapsRoutingService,
+        budget_calculator: BudgetCalculator,
+        gemini_service: Optional[GeminiService] = None,
+    ):
+        self.maps_routing_service = maps_routing_service
+        self.budget_calculator = budget_calculator
+        self.gemini_service = gemini_service
+
+    async def _travel_matrix(
+        self, labels: List[str], modes: List[str]
+    ) -> Tuple[List[List[int]], List[List[str]]]:
+        """Fastest travel time and its mode for every ordered pair of locations."""
+        n = len(labels)
+        pairs = [(i, j, mode) for i in range(n) for j in range(n) if i != j for mode in modes]
+        results = await asyncio.gather(
+            *(
+                self.maps_routing_service.get_travel_time(labels[i], labels[j], mode)
+                for i, j, mode in pairs
+            ),
+            return_exceptions=True,
+        )
+        travel = [[0] * n for _ in range(n)]
+        travel_modes = [[modes[0]] * n for _ in range(n)]
+        best: Dict[Tuple[int, int], int] = {}
+        for (i, j, mode), minutes in zip(pairs, results):
+            if isinstance(minutes, Exception) or minutes is None:
+                minutes = DEFAULT_TRAVEL_MINUTES
+            if (i, j) not in best or minutes < best[(i, j)]:
+                best[(i, j)] = minutes
+                travel[i][j] = int(minutes)
+                travel_modes[i][j] = mode
+        return travel, travel_modes
+
+    async def optimize_itinerary(
+        self,
+        city: str,
+        trip_date: datetime,
+        selected_locations: List[Dict[str, Any]],
+        return_time: str,
+        user_preferences: Dict[str, Any],
+    ) -> OptimizedItinerary:
+        modes = [
+            mode
+            for mode in user_preferences.get("preferred_transport") or []
+            if mode in STEP_TRANSPORT_MODES
+        ] or ["public_transit"]
+        labels = [loc.get("address") or f"{loc.get('name')}, {city}" for loc in selected_locations]
+        travel, travel_modes = await self._travel_matrix(labels, modes)
+
+        # 0 is a valid parse (midnight), so only None falls back to the default
+        day_start = parse_clock_time(settings.ITINERARY_DAY_START)
+        if day_start is None:
+            day_start = 9 * 60
+        return_by = parse_clock_time(return_time)
+        if return_by is None:
+            return_by = DEFAULT_RETURN_MINUTES
+        if return_by <= day_start:
+            return_by += MINUTES_PER_DAY  # e.g. '1 AM' means after midnight
+        weekday = trip_date.strftime("%A").lower()
+        windows = [
+            parse_operating_hours(loc.get("operating_hours_summary"), weekday)
+            for loc in selected_locations
+        ]
+        plan = _DayPlan(
+            durations=[int(loc.get("estimated_time_spent_minutes") or 0) for loc in selected_locations],
+            windows=windows,
+            travel=travel,
+            day_start=day_start,
+            return_by=return_by,
+            buffer=PACE_BUFFER_MINUTES.get(user_preferences.get("pace"), PACE_BUFFER_MINUTES["relaxed"]),
+        )
+        if plan.n == 0:
+            order: List[int] = []
+        elif plan.n <= settings.ITINERARY_EXACT_MAX_LOCATIONS:
+            order = plan.solve_exact()
+        else:
+            order = plan.solve_greedy()
+
+        itinerary = await self._build_itinerary(
+            plan, order, selected_locations, windows, travel_modes, user_preferences
+        )
+        if settings.ITINERARY_GEMINI_NOTES_ENABLED and self.gemini_service and itinerary.itinerary_steps:
+            await self._add_gemini_notes(city, trip_date, itinerary)
+        return itinerary
+
+    async def _build_itinerary(
+        self,
+        plan: _DayPlan,
+        order: List[int],
+        locations: List[Dict[str, Any]],
+        windows: List[Optional[Tuple[int, int]]],
+        travel_modes: List[List[str]],
+        user_preferences: Dict[str, Any],
+    ) -> OptimizedItinerary:
+        steps: List[OptimizedItineraryStep] = []
+        problems: List[str] = []
+        t, meals, prev = plan.day_start, 0, None
+        total_travel = 0
+        total_activity = 0
+        modes_used = set()
+
+        def add_meal(bit: int, start: int, near: Optional[Dict[str, Any]]) -> None:
+            name, _, _, duration = MEALS[bit]
+            place = near.get("name") if near else "your last stop"
+            steps.append(
+                OptimizedItineraryStep(
+                    activity=name,
+                    start_time=format_clock_time(start),
+                    end_time=format_clock_time(start + duration),
+                    location_name=f"{name} near {place}",
+                    notes=f"{name} break ({duration} min).",
+                )
+            )
+
+        for j in order:
+            t, meals, late, details = plan.advance(prev, j, t, meals)
+            for bit, start in details["meals"]:
+                add_meal(bit, start, locations[prev])
+            if prev is not None:
+                # The travel leg hangs off whatever step precedes this visit
+                mode = travel_modes[prev][j]
+                steps[-1].transport_mode_to_next = STEP_TRANSPORT_MODES[mode]
+                steps[-1].estimated_travel_time_minutes = plan.travel[prev][j]
+                total_travel += plan.travel[prev][j]
+                modes_used.add(mode)
+
+            loc = locations[j]
+            notes = []
+            window = windows[j]
+            if window is None:
+                notes.append("Listed as closed on this day.")
+                problems.append(f"{loc.get('name')} appears to be closed")
+            elif late:
+                notes.append(f"Closes at {format_clock_time(window[1])}; the visit runs past closing.")
+                problems.append(f"{loc.get('name')} cannot be fully visited before closing")
+            if details["start"] > details["arrive"]:
+                notes.append(f"Opens at {format_clock_time(details['start'])}.")
+            steps.append(
+                OptimizedItineraryStep(
+                    activity=f"Visit {loc.get('name')}",
+                    start_time=format_clock_time(details["start"]),
+                    end_time=format_clock_time(t),
+                    location_name=loc.get("name"),
+                    address=loc.get("address"),
+                    notes=" ".join(notes) or None,
+                )
+            )
+            total_activity += plan.durations[j]
+            prev = j
+
+        day_end, over_return, closing_meals = plan.finish(t, meals)
+        for bit, start in closing_meals:
+            add_meal(bit, start, locations[prev] if prev is not None else None)
+        if over_return:
+            problems.append(f"the day ends at {format_clock_time(day_end)}, after the return time")
+
+        if problems:
+            feasibility_status = "not_possible"
+            feasibility_notes = "Not everything fits: " + "; ".join(problems) + ". Consider dropping a stop."
+        elif plan.return_by - day_end < TIGHT_MARGIN_MINUTES:
+            feasibility_status = "tight_but_possible"
+            feasibility_notes = (
+                f"The day ends at {format_clock_time(day_end)}, less than an hour before the return time."
+            )
+        else:
+            feasibility_status = "possible"
+            feasibility_notes = f"The day ends at {format_clock_time(day_end)}, leaving time to spare."
+
+        admissions = sum(loc.get("admission_cost_usd") or 0.0 for loc in locations)
+        meal_count = sum(1 for step in steps if step.activity in {meal[0] for meal in MEALS})
+        food = await self.budget_calculator.estimate_food_costs(
+            meal_count, user_preferences.get("budget_range", "mid-range")
+        )
+        transport_cost = 0.0
+        for mode in sorted(modes_used):
+            transport_cost += sum(
+                (await self.budget_calculator.estimate_transport_costs(mode)).values()
+            )
+
+        return OptimizedItinerary(
+            itinerary_steps=steps,
+            total_estimated_cost_usd=round(
+                admissions + food.get("estimated_food_cost_usd", 0.0) + transport_cost, 2
+            ),
+            feasibility_status=feasibility_status,
+            feasibility_notes=feasibility_notes,
+            total_travel_time_minutes=total_travel,
+            total_activity_time_minutes=total_activity,
+        )
+
+    async def _add_gemini_notes(
+        self, city: str, trip_date: datetime, itinerary: OptimizedItinerary
+    ) -> None:
+        """Merges Gemini-written tips into the step notes; the schedule itself is never changed."""
+        try:
+            annotations = await self.gemini_service.write_itinerary_notes(
+                city, trip_date, itinerary
+            )
+        except Exception as e:
+            print(f"ItineraryScheduler: Skipping Gemini notes: {e}")
+            return
+        for step, note in zip(itinerary.itinerary_steps, annotations.step_notes):
+            if note:
+                step.notes = f"{step.notes} {note}" if step.notes else note
+        if annotations.feasibility_notes:
+            itinerary.feasibility_notes = (
+                f"{itinerary.feasibility_notes} {annotations.feasibility_notes}"
+            )
@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Coroutine, Dict, List, Optional, Type, TypeVar
+
+from beanie.operators import Set
+from pydantic import BaseModel
+
+from app.config import settings
+from app.models.gemini_models import OptimizedItinerary, TripPlanningAnalysis
+from app.models.trip import Trip, TripDraft
+from app.services.gemini_service import GeminiService
+from app.services.itinerary_scheduler import ItineraryScheduler
+from app.services.weather_service import WeatherService, normalize_city_name
+from app.utils.cache import TTLCache
+
+# Counters for get_plan_precompute_stats(): jobs started, endpoint calls served by an existing
+# job in this worker, and results served from the trip document (generated by any worker)
+_precompute_counters = {"started": 0, "reused": 0, "stored": 0, "failed": 0}
+
+ResultT = TypeVar("ResultT", bound=BaseModel)
+
+
+class PlanJobs:
+    """The detailed analysis and the itinerary for one location selection, generated concurrently."""
+
+    def __init__(self, analysis: asyncio.Future, itinerary: asyncio.Future):
+        self.analysis = analysis
+        self.itinerary = itinerary
+
+
+class PlanPrecomputer:
+    """
+    Starts detailed analysis and itinerary generation together the first time either
+    endpoint sees a location selection, and keeps both tasks per trip_id. The second
+    endpoint call then awaits the in-flight (or finished) task instead of paying for
+    another sequential round trip. Jobs are per worker process and per user; callers
+    pass the owner-filtered TripDraft. Finished results are also saved on the trip under
+    plan_results with a hash of their inputs, so a call routed to another worker (or
+    arriving after the job expired) for the same inputs is served from the document.
+    """
+
+    def __init__(
+        self,
+        weather_service: WeatherService,
+        gemini_service: GeminiService,
+        itinerary_scheduler: ItineraryScheduler,
+    ):
+        self.weather_service = weather_service
+        self.gemini_service = gemini_service
+        self.itinerary_scheduler = itinerary_scheduler
+        self._jobs = TTLCache(
+            max_entries=settings.PLAN_PRECOMPUTE_MAX_ENTRIES,
+            ttl_seconds=settings.PLAN_PRECOMPUTE_TTL_SECONDS,
+        )
+
+    @staticmethod
+    def _fingerprint(selection: Dict[str, Any]) -> str:
+        """A changed selection for the same trip must not be served the old results."""
+        return hashlib.sha256(
+            json.dumps(selection, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _stored(
+        draft: TripDraft, kind: str, fingerprint: str, model: Type[ResultT]
+    ) -> Optional[ResultT]:
+        """The result saved on the trip for these inputs, if there is one and it still parses."""
+        stored = draft.plan_results.get(kind) or {}
+        if stored.get("inputs") != fingerprint:
+            return None
+        try:
+            return model.model_validate(stored.get("result"))
+        except ValueError:
+            return None
+
+    async def _generate_and_save(
+        self,
+        draft: TripDraft,
+        kind: str,
+        fingerprint: str,
+        generation: Coroutine[Any, Any, ResultT],
+    ) -> ResultT:
+        result = await generation
+        try:
+            # Not a plan update: the trip's version and updated_at stay as they are
+            await Trip.find_one(Trip.id == draft.id).update(
+                Set({f"plan_results.{kind}": {"inputs": fingerprint, "result": result.model_dump()}})
+            )
+        except Exception as e:
+            print(f"PlanPrecomputer: could not save the {kind} for trip {draft.id}: {e}")
+        return result
+
+    async def _weather_for(self, draft: TripDraft, city: str, trip_date: datetime) -> Dict[str, Any]:
+        """Reuses the forecast saved with the draft trip rather than fetching it again."""
+        if (
+            normalize_city_name(draft.destination) == normalize_city_name(city)
+            and draft.trip_date.date() == trip_date.date()
+        ):
+            info = draft.weather_info
+            # A snapshot key means the summary came from a real forecast slot, not an error
+            if info.get("snapshot_key") and info.get("forecast"):
+                return dict(info["forecast"])
+            legacy = info.get("raw_weather_data") or {}
+            if legacy.get("raw_data"):
+                return legacy
+        return await self.weather_service.get_weather_forecast(city, trip_date)
+
+    async def _run_analysis(
+        self,
+        draft: TripDraft,
+        city: str,
+        trip_date: datetime,
+        selected_locations: List[Dict[str, Any]],
+        return_time: str,
+        user_preferences: Dict[str, Any],
+    ) -> TripPlanningAnalysis:
+        weather_data = await self._weather_for(draft, city, trip_date)
+        return await self.gemini_service.get_detailed_trip_analysis(
+            city=city,
+            trip_date=trip_date,
+            selected_locations=selected_locations,
+            return_time=return_time,
+            user_preferences=user_preferences,
+            weather_data=weather_data,
+        )
+
+    async def _run_itinerary(
+        self,
+        city: str,
+        trip_date: datetime,
+        selected_locations: List[Dict[str, Any]],
+        return_time: str,
+        user_preferences: Dict[str, Any],
+    ) -> OptimizedItinerary:
+        planner = (
+            self.itinerary_scheduler
+            if settings.ITINERARY_PLANNER == "local"
+            else self.gemini_service
+        )
+        return await planner.optimize_itinerary(
+            city=city,
+            trip_date=trip_date,
+            selected_locations=selected_locations,
+            return_time=return_time,
+            user_preferences=user_preferences,
+        )
+
+    def _jobs_for(
+        self,
+        draft: TripDraft,
+        user_id: str,
+        city: str,
+        trip_date: datetime,
+        selected_locations: List[Dict[str, Any]],
+        return_time: str,
+        user_preferences: Dict[str, Any],
+    ) -> PlanJobs:
+        fingerprint = self._fingerprint(
+            {
+                "city": city,
+                "date": trip_date,
+                "locations": selected_locations,
+                "return_time": return_time,
+                "preferences": user_preferences,
+            }
+        )
+        key = (str(draft.id), user_id, fingerprint)
+        jobs = self._jobs.get(key)
+        if jobs is not None:
+            _precompute_counters["reused"] += 1
+            return jobs
+
+        def stored_or_generated(
+            kind: str, model: Type[ResultT], generation: Coroutine[Any, Any, ResultT]
+        ) -> asyncio.Future:
+            stored = self._stored(draft, kind, fingerprint, model)
+            if stored is not None:
+                generation.close()  # Never started
+                _precompute_counters["stored"] += 1
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(stored)
+                return future
+            return asyncio.create_task(
+                self._generate_and_save(draft, kind, fingerprint, generation)
+            )
+
+        jobs = PlanJobs(
+            analysis=stored_or_generated(
+                "analysis",
+                TripPlanningAnalysis,
+                self._run_analysis(
+                    draft, city, trip_date, selected_locations, return_time, user_preferences
+                ),
+            ),
+            itinerary=stored_or_generated(
+                "itinerary",
+                OptimizedItinerary,
+                self._run_itinerary(
+                    city, trip_date, selected_locations, return_time, user_preferences
+                ),
+            ),
+        )
+
+        if not (jobs.analysis.done() and jobs.itinerary.done()):
+            _precompute_counters["started"] += 1
+
+        def evict_on_failure(task: asyncio.Future) -> None:
+            # Also marks the exception as retrieved when only one endpoint is ever called
+            if task.cancelled() or task.exception() is not None:
+                _precompute_counters["failed"] += 1
+                if self._jobs.get(key) is jobs:
+                    self._jobs.pop(key)
+
+        jobs.analysis.add_done_callback(evict_on_failure)
+        jobs.itinerary.add_done_callback(evict_on_failure)
+        self._jobs.set(key, jobs)
+        return jobs
+
+    async def get_analysis(
+        self, draft: TripDraft, user_id: str, **selection: Any
+    ) -> TripPlanningAnalysis:
+        jobs = self._jobs_for(draft, user_id, **selection)
+        # Shielded: a disconnecting client must not cancel work the other endpoint needs
+        return await asyncio.shield(jobs.analysis)
+
+    async def get_itinerary(
+        self, draft: TripDraft, user_id: str, **selection: Any
+    ) -> OptimizedItinerary:
+        jobs = self._jobs_for(draft, user_id, **selection)
+        return await asyncio.shield(jobs.itinerary)
+
+
+def get_plan_precompute_stats() -> Dict[str, int]:
+    """Started jobs, endpoint calls that reused one, results served from the trip and failed generations in this worker."""
+    return dict(_precompute_counters)
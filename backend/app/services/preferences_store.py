@@ -0,0 +1,67 @@
+from typing import Any, Dict, Optional
+
+from beanie.odm.queries.update import UpdateResponse
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.models.preferences import UserPreferences
+from app.utils.cache import TTLCache
+
+PREFERENCE_FIELDS = {"interests", "pace", "preferred_transport", "budget_range"}
+
+# user_id -> UserPreferences. Writes in this worker update it; other workers see them after the TTL.
+_preferences_cache = TTLCache(
+    max_entries=settings.PREFERENCES_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PREFERENCES_CACHE_TTL_SECONDS,
+)
+
+
+def preferences_dict(preferences: UserPreferences) -> Dict[str, Any]:
+    """The preference values used for planning, without ids."""
+    return preferences.model_dump(include=PREFERENCE_FIELDS)
+
+
+class PreferencesStore:
+    """
+    Per-user trip preferences behind a write-through cache. Reads that find nothing
+    create the defaults with a single upsert, so concurrent first reads cannot insert
+    duplicates (user_id is also uniquely indexed).
+    """
+
+    async def get(self, user_id: str) -> UserPreferences:
+        """The user's preferences, created with defaults if they have none yet."""
+        preferences = _preferences_cache.get(user_id)
+        if preferences is not None:
+            return preferences
+        defaults = preferences_dict(UserPreferences(user_id=user_id))
+        preferences = await UserPreferences.find_one(UserPreferences.user_id == user_id).update(
+            {"$setOnInsert": defaults},
+            upsert=True,
+            response_type=UpdateResponse.NEW_DOCUMENT,
+        )
+        _preferences_cache.set(user_id, preferences)
+        return preferences
+
+    async def create(self, user_id: str, values: Dict[str, Any]) -> Optional[UserPreferences]:
+        """Inserts preferences; returns None if the user already has some."""
+        preferences = UserPreferences(user_id=user_id, **values)
+        try:
+            await preferences.insert()
+        except DuplicateKeyError:
+            return None
+        _preferences_cache.set(user_id, preferences)
+        return preferences
+
+    async def update(
+        self, user_id: str, values: Dict[str, Any], upsert: bool = False
+    ) -> Optional[UserPreferences]:
+        """Sets the given fields in one round trip; returns None if there was nothing to update."""
+        preferences = await UserPreferences.find_one(UserPreferences.user_id == user_id).update(
+            {"$set": values},
+            upsert=upsert,
+            response_type=UpdateResponse.NEW_DOCUMENT,
+        )
+        if preferences is not None:
+            _preferences_cache.set(user_id, preferences)
+        return preferences
+
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Literal
+from typing import List, Dict, Any, Literal, AsyncIterator, Tuple
 from datetime import datetime
 from app.services.gemini_service import GeminiService
 from app.models.gemini_models import InitialTripSuggestions
@@ -31,4 +31,23 @@ class RecommendationEngine:
             trip_date=trip_date,
             weather_data=weather_data
         )
-        return suggestions
\ No newline at end of file
+        return suggestions
+
+    def stream_initial_trip_suggestions(
+        self,
+        city: str,
+        interests: List[str],
+        pace: Literal["fast-paced", "relaxed"],
+        trip_date: datetime,
+        weather_data: Dict[str, Any]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming counterpart of get_initial_trip_suggestions; see GeminiService for the event format.
+        """
+        return self.gemini_service.stream_initial_trip_suggestions(
+            city=city,
+            interests=interests,
+            pace=pace,
+            trip_date=trip_date,
+            weather_data=weather_data
+        )
@@ -0,0 +1,128 @@
+import csv
+import math
+import os
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Bundled table of cities with their IANA timezone; see app/data/city_timezones.csv
+_TABLE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "city_timezones.csv"
+)
+_CELL_DEGREES = 2.0
+_KM_PER_DEGREE = 111.195
+_EARTH_RADIUS_KM = 6371.0
+# Beyond this distance from any known city (open ocean, polar regions) we fall
+# back to the nautical zone for the longitude instead of trusting a far-away city.
+_MAX_MATCH_KM = 1500.0
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * _EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def nautical_timezone(lon: float) -> str:
+    """Returns the Etc/GMT zone for a longitude (note Etc/GMT signs are inverted)."""
+    offset = max(-12, min(12, int(round(lon / 15.0))))
+    return "Etc/GMT" if offset == 0 else f"Etc/GMT{-offset:+d}"
+
+
+class TimezoneResolver:
+    """
+    Offline lat/lon -> IANA timezone lookup.
+    Cities from the bundled table are bucketed into a fixed lat/lon grid, and a
+    lookup searches outward ring by ring from the query's cell for the nearest city.
+    """
+
+    def __init__(self, table_path: str = _TABLE_PATH, cell_degrees: float = _CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._rows = int(math.ceil(180 / cell_degrees))
+        self._cols = int(math.ceil(360 / cell_degrees))
+        self._grid: Dict[Tuple[int, int], List[Tuple[float, float, str]]] = defaultdict(list)
+        self.size = 0
+        with open(table_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                lat, lon = float(row["lat"]), float(row["lon"])
+                self._grid[self._cell(lat, lon)].append((lat, lon, row["timezone"]))
+                self.size += 1
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = min(self._rows - 1, int((lat + 90) // self.cell_degrees))
+        col = int((lon + 180) // self.cell_degrees) % self._cols
+        return row, col
+
+    def _ring(self, row: int, col: int, r: int):
+        """Yields the grid cells at Chebyshev distance r, wrapping across the antimeridian."""
+        if r == 0:
+            yield row, col
+            return
+        seen = set()
+        for dr in range(-r, r + 1):
+            rr = row + dr
+            if not 0 <= rr < self._rows:
+                continue
+            step = 1 if abs(dr) == r else 2 * r  # Full edge rows, only the two end columns otherwise
+            for dc in range(-r, r + 1, step):
+                cell = (rr, (col + dc) % self._cols)
+                if cell not in seen:
+                    seen.add(cell)
+                    yield cell
+
+    def nearest(self, lat: float, lon: float) -> Optional[Tuple[str, float]]:
+        """Returns (timezone, distance_km) of the nearest known city within range."""
+        row, col = self._cell(lat, lon)
+        # Enough rings to cover _MAX_MATCH_KM in latitude, and in longitude at the
+        # highest latitude that range can reach (cells narrow towards the poles).
+        lat_rings = int(math.ceil(_MAX_MATCH_KM / (self.cell_degrees * _KM_PER_DEGREE)))
+        reach_lat = min(89.0, abs(lat) + lat_rings * self.cell_degrees)
+        lon_cell_km = self.cell_degrees * _KM_PER_DEGREE * math.cos(math.radians(reach_lat))
+        max_rings = int(math.ceil(_MAX_MATCH_KM / lon_cell_km)) + 1
+        max_rings = min(max_rings, max(self._rows, self._cols // 2))
+
+        best: Optional[Tuple[str, float]] = None
+        for r in range(max_rings + 1):
+            for cell in self._ring(row, col, r):
+                for c_lat, c_lon, tz in self._grid.get(cell, ()):
+                    dist = _haversine_km(lat, lon, c_lat, c_lon)
+                    if best is None or dist < best[1]:
+                        best = (tz, dist)
+            if best is not None:
+                # Anything in ring r+1 or beyond is at least r cells away in latitude
+                # or longitude; longitude cells shrink towards the poles.
+                reach_lat = min(89.0, abs(lat) + (r + 1) * self.cell_degrees)
+                bound = r * self.cell_degrees * _KM_PER_DEGREE * math.cos(math.radians(reach_lat))
+                if best[1] <= bound:
+                    break
+
+        if best is None or best[1] > _MAX_MATCH_KM:
+            return None
+        return best
+
+    def resolve(self, lat: float, lon: float) -> str:
+        match = self.nearest(lat, lon)
+        return match[0] if match else nautical_timezone(lon)
+
+
+@lru_cache(maxsize=1)
+def get_timezone_resolver() -> TimezoneResolver:
+    return TimezoneResolver()
+
+
+@lru_cache(maxsize=8192)
+def _resolve_rounded(lat: float, lon: float) -> str:
+    return get_timezone_resolver().resolve(lat, lon)
+
+
+def timezone_for_coordinates(lat: float, lon: float) -> str:
+    """
+    Maps coordinates to an IANA timezone name without network access.
+    Results are memoized on coordinates rounded to ~1 km.
+    """
+    return _resolve_rounded(round(lat, 2), round(lon, 2))
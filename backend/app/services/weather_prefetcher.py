@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.models.trip import Trip
+from app.services.weather_service import (
+    WeatherService,
+    WeatherUnavailableError,
+    normalize_city_name,
+)
+from app.utils.http_client import UpstreamBudget, UpstreamBudgetExhausted
+
+
+class WeatherPrefetcher:
+    """
+    Background task that keeps the forecast cache warm for saved trips whose
+    date falls inside the forecast horizon, so reopening a trip or moving on to
+    the detailed analysis rarely has to wait for OpenWeatherMap.
+    """
+
+    def __init__(
+        self,
+        weather_service: WeatherService,
+        interval_seconds: int = settings.WEATHER_PREFETCH_INTERVAL_SECONDS,
+        horizon_days: int = settings.WEATHER_PREFETCH_HORIZON_DAYS,
+        max_upstream_calls: int = settings.WEATHER_PREFETCH_MAX_UPSTREAM_CALLS,
+    ):
+        self.weather_service = weather_service
+        self.interval_seconds = interval_seconds
+        self.horizon_days = horizon_days
+        self.max_upstream_calls = max_upstream_calls
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
+
+    async def _upcoming_destinations(self) -> List[str]:
+        """Destinations of trips inside the horizon, most popular first."""
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        horizon_end = today + timedelta(days=self.horizon_days + 1)
+        rows = await Trip.find(
+            Trip.trip_date >= today, Trip.trip_date < horizon_end
+        ).aggregate(
+            [{"$group": {"_id": "$destination", "trip_count": {"$sum": 1}}}]
+        ).to_list()
+
+        # Different spellings of the same city share one forecast
+        counts: Dict[str, int] = {}
+        display_names: Dict[str, str] = {}
+        for row in rows:
+            if not row.get("_id"):
+                continue
+            key = normalize_city_name(row["_id"])
+            counts[key] = counts.get(key, 0) + row["trip_count"]
+            display_names.setdefault(key, row["_id"])
+        ranked = sorted(counts, key=lambda key: counts[key], reverse=True)
+        return [display_names[key] for key in ranked]
+
+    async def run_cycle(self) -> Dict[str, int]:
+        """
+        Refreshes forecasts for upcoming trip destinations. Every upstream request
+        (geocoding, forecast, failed attempts and retries) counts against the budget.
+        """
+        destinations = await self._upcoming_destinations()
+        budget = UpstreamBudget(self.max_upstream_calls)
+        fetched = skipped = geocode_failed = fetch_failed = 0
+        for city_name in destinations:
+            if budget.exhausted:
+                break
+            try:
+                if await self.weather_service.prefetch_forecast(city_name, budget):
+                    fetched += 1
+                else:
+                    skipped += 1
+            except UpstreamBudgetExhausted:
+                break
+            except WeatherUnavailableError as e:
+                geocode_failed += 1
+                print(f"WeatherPrefetcher: Skipping {city_name}: {e}")
+            except Exception as e:
+                fetch_failed += 1
+                print(f"WeatherPrefetcher: Failed to prefetch forecast for {city_name}: {e}")
+        stats = {
+            "destinations": len(destinations),
+            "fetched": fetched,
+            "already_cached": skipped,
+            "geocode_failed": geocode_failed,
+            "fetch_failed": fetch_failed,
+            "upstream_calls": budget.spent,
+        }
+        print(f"WeatherPrefetcher: Cycle complete {stats}")
+        return stats
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                # Never let one bad cycle (e.g. Mongo hiccup) kill the scheduler
+                print(f"WeatherPrefetcher: Cycle failed: {e}")
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stop_event.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Signals the loop to exit and waits for an in-progress cycle to finish."""
+        if self._task is None:
+            return
+        self._stop_event.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=10)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
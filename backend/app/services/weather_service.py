@@ -1,198 +1,377 @@
-import requests
+import httpx
+import re
+import time
 from datetime import datetime, date, timedelta, timezone
-from typing import Dict, Any, Optional
+from bisect import bisect_left, bisect_right
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from app.config import settings
-import pytz  # Will need this for proper timezone handling
+from app.models.geocode import GeocodeCacheEntry
+from app.services.timezone_resolver import timezone_for_coordinates
+from app.utils.cache import SingleFlight, TTLCache
+from app.utils.http_client import UpstreamBudget, get_json
+import pytz
+
+# Shared by every WeatherService instance in the worker (routes each create their own)
+_coordinates_cache = TTLCache(
+    max_entries=settings.GEOCODE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.GEOCODE_CACHE_TTL_SECONDS,
+)
+_forecast_cache = TTLCache(max_entries=settings.FORECAST_CACHE_MAX_ENTRIES)
+_forecast_flights = SingleFlight()
+
+
+class WeatherUnavailableError(Exception):
+    """No forecast could be retrieved for a city. The message is the summary shown to users."""
+
+
+def normalize_city_name(city_name: str) -> str:
+    """
+    Normalizes a city name into a cache key, so "St. Louis, MO" and "st louis ,mo"
+    both map to "st louis,mo". Case, whitespace and punctuation are normalized within
+    each comma-separated part; the region and country parts are kept, so "Paris, TX"
+    and "Paris, FR" stay distinct. "Chicago" and "Chicago, IL" therefore get separate
+    geocode entries too, but resolve to the same coordinates and so share the forecast,
+    which is cached by coordinates.
+    """
+    parts = (re.sub(r"[^\w\s]|_", " ", part) for part in city_name.lower().split(","))
+    return ",".join(filter(None, (" ".join(part.split()) for part in parts)))
+
+
+def forecast_cache_key(lat: float, lon: float, now: Optional[float] = None) -> Tuple:
+    """
+    Builds the forecast cache key from rounded coordinates and the current
+    OWM issuance bucket, so a key naturally goes stale when a new forecast is issued.
+    """
+    bucket_seconds = settings.FORECAST_ISSUANCE_HOURS * 3600
+    bucket = int((time.time() if now is None else now) // bucket_seconds)
+    precision = settings.FORECAST_COORD_PRECISION
+    return (round(lat, precision), round(lon, precision), bucket)
+
+
+def _as_date(value: date) -> date:
+    """Routes pass datetimes for trip dates; forecasts are looked up per calendar day."""
+    return value.date() if isinstance(value, datetime) else value
+
+
+class ParsedForecast:
+    """
+    An OWM 5-day forecast parsed once into a sorted array of slot timestamps.
+    Slot selection is a binary search, so one cached instance can answer
+    many target dates cheaply.
+    """
+
+    __slots__ = ("timestamps", "items")
+
+    def __init__(self, payload: Dict[str, Any]):
+        entries = []
+        for item in payload.get("list", []):
+            ts = item.get("dt")
+            if ts is None:
+                # "dt" is always present in practice; fall back to the UTC text form just in case
+                ts = datetime.strptime(item["dt_txt"], "%Y-%m-%d %H:%M:%S").replace(
+                    tzinfo=timezone.utc
+                ).timestamp()
+            entries.append((int(ts), item))
+        entries.sort(key=lambda entry: entry[0])
+        self.timestamps: List[int] = [entry[0] for entry in entries]
+        self.items: List[Dict[str, Any]] = [entry[1] for entry in entries]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def select_slot(self, target_date: date, city_tz) -> Optional[Dict[str, Any]]:
+        """
+        Returns the forecast slot inside the target local day that is closest to
+        local midday, or None if the forecast does not cover that day.
+        """
+        y, m, d = target_date.year, target_date.month, target_date.day
+        day_start = city_tz.localize(datetime(y, m, d, 0, 0, 0)).timestamp()
+        day_end = city_tz.localize(datetime(y, m, d, 23, 59, 59)).timestamp()
+        midday = city_tz.localize(datetime(y, m, d, 12, 0, 0)).timestamp()
+
+        lo = bisect_left(self.timestamps, day_start)
+        hi = bisect_right(self.timestamps, day_end)
+        if lo >= hi:
+            return None
+
+        # Only the slots on either side of midday can be the closest one
+        i = bisect_left(self.timestamps, midday, lo, hi)
+        candidates = [j for j in (i - 1, i) if lo <= j < hi]
+        best = min(candidates, key=lambda j: (abs(self.timestamps[j] - midday), j))
+        return self.items[best]
+
+    def select_slots(
+        self, target_dates: Iterable[date], city_tz
+    ) -> Dict[date, Optional[Dict[str, Any]]]:
+        """Selects the midday slot for each of several target dates."""
+        return {
+            _as_date(target_date): self.select_slot(_as_date(target_date), city_tz)
+            for target_date in target_dates
+        }
+
+
+def get_forecast_cache_stats() -> Dict[str, int]:
+    """Hit/miss/coalesce counters for the forecast cache, used to size it."""
+    stats = _forecast_cache.stats()
+    stats["coalesced"] = _forecast_flights.coalesced
+    stats["in_flight"] = len(_forecast_flights)
+    return stats
 
 
 class WeatherService:
     def __init__(self):
         self.api_key = settings.OPENWEATHER_API_KEY
         self.base_url = "http://api.openweathermap.org/data/2.5/"
-        # Map some common cities to their IANA timezones if not using a dedicated TZ service
-        self.city_timezones = {
-            # USA
-            "new_york": "America/New_York",
-            "chicago": "America/Chicago",
-            "denver": "America/Denver",
-            "los_angeles": "America/Los_Angeles",
-            "anchorage": "America/Anchorage",
-            "honolulu": "Pacific/Honolulu",
-            # Australia
-            "sydney": "Australia/Sydney",
-            "melbourne": "Australia/Melbourne",
-            "brisbane": "Australia/Brisbane",
-            "adelaide": "Australia/Adelaide",
-            "perth": "Australia/Perth",
-            "darwin": "Australia/Darwin",
-            # India
-            "new_delhi": "Asia/Kolkata",
-        }
 
-    async def _get_coordinates(self, city_name: str) -> Optional[Dict[str, float]]:
-        """Fetches latitude and longitude for a given city name."""
+    async def _get_coordinates(
+        self, city_name: str, budget: Optional[UpstreamBudget] = None
+    ) -> Optional[Dict[str, float]]:
+        """
+        Resolves a city name to latitude and longitude.
+        Checks the in-process LRU, then the persistent Mongo cache, and only then OWM.
+        """
+        cache_key = normalize_city_name(city_name)
+        coords = _coordinates_cache.get(cache_key)
+        if coords is not None:
+            return coords
+
+        try:
+            entry = await GeocodeCacheEntry.find_one(GeocodeCacheEntry.key == cache_key)
+        except Exception as e:
+            # The persistent tier is an optimization; never fail a lookup because of it
+            print(f"WeatherService: Geocode cache read failed for '{cache_key}': {e}")
+            entry = None
+        if entry is not None:
+            coords = {"lat": entry.lat, "lon": entry.lon}
+            _coordinates_cache.set(cache_key, coords)
+            return coords
+
+        coords = await self._fetch_coordinates(city_name, budget)
+        if coords is not None:
+            _coordinates_cache.set(cache_key, coords)
+            await self._store_coordinates(cache_key, city_name, coords)
+        return coords
+
+    async def _store_coordinates(
+        self, cache_key: str, city_name: str, coords: Dict[str, float]
+    ) -> None:
+        """Upserts a geocoding result into the persistent cache."""
+        try:
+            await GeocodeCacheEntry.find_one(GeocodeCacheEntry.key == cache_key).upsert(
+                {
+                    "$set": {
+                        "lat": coords["lat"],
+                        "lon": coords["lon"],
+                        "query": city_name.strip(),
+                        "created_at": datetime.utcnow(),
+                    }
+                },
+                on_insert=GeocodeCacheEntry(
+                    key=cache_key,
+                    query=city_name.strip(),
+                    lat=coords["lat"],
+                    lon=coords["lon"],
+                ),
+            )
+        except Exception as e:
+            print(f"WeatherService: Geocode cache write failed for '{cache_key}': {e}")
+
+    async def _fetch_coordinates(
+        self, city_name: str, budget: Optional[UpstreamBudget] = None
+    ) -> Optional[Dict[str, float]]:
+        """Fetches latitude and longitude for a given city name from OWM."""
         # Using the direct geocoding API for more reliable lat/lon and potentially timezone info
         # Note: The free tier Geocoding API may not return 'timezone' field directly from /direct endpoint.
         # It's usually in /weather or /forecast. Let's stick to the main weather endpoint for now
         # as it was implicitly providing timezone (though not consistently documented for direct use).
-        # We'll primarily rely on a manual map or an external library for timezones.
+        # Timezones are resolved offline from the coordinates (see timezone_resolver).
 
-        geo_url = f"{self.base_url}weather?q={city_name}&appid={self.api_key}"
+        geo_url = f"{self.base_url}weather"
         try:
-            response = requests.get(geo_url)
-            response.raise_for_status()
-            data = response.json()
+            data = await get_json(
+                geo_url,
+                params={"q": city_name.strip(), "appid": self.api_key},
+                budget=budget,
+            )
             if data and data.get("coord"):
                 return {
                     "lat": data["coord"]["lat"],
                     "lon": data["coord"]["lon"],
-                    # Don't rely on 'timezone' from this endpoint for offset, use pytz
+                    # Don't rely on 'timezone' from this endpoint for offset, see timezone_resolver
                 }
             return None
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"WeatherService: Error fetching coordinates for {city_name}: {e}")
             return None
 
-    async def get_weather_forecast(
-        self, city_name: str, target_date: date
-    ) -> Dict[str, Any]:
-        coords = await self._get_coordinates(city_name)
+    async def prefetch_forecast(
+        self, city_name: str, budget: Optional[UpstreamBudget] = None
+    ) -> bool:
+        """
+        Warms the forecast cache for a city.
+        Returns True if an upstream forecast download was needed, False if it was already cached.
+        Raises WeatherUnavailableError if the city can't be geocoded. Geocoding and forecast
+        requests, retries included, are charged to `budget`.
+        """
+        coords = await self._get_coordinates(city_name, budget)
         if not coords:
-            print(f"WeatherService: Could not get coordinates for {city_name}.")
+            raise WeatherUnavailableError(f"Could not get coordinates for {city_name}.")
+        if forecast_cache_key(coords["lat"], coords["lon"]) in _forecast_cache:
+            return False
+        await self._get_forecast_payload(coords["lat"], coords["lon"], budget)
+        return True
+
+    async def _get_forecast_payload(
+        self, lat: float, lon: float, budget: Optional[UpstreamBudget] = None
+    ) -> ParsedForecast:
+        """
+        Returns the parsed 5-day forecast for the coordinates.
+        Served from cache within an issuance bucket; concurrent misses share one upstream call.
+        Budgeted (prefetch) fetches run outside the shared flights, so a user request never
+        waits on a call that can fail with the prefetcher's UpstreamBudgetExhausted.
+        """
+        cache_key = forecast_cache_key(lat, lon)
+        forecast = _forecast_cache.get(cache_key)
+        if forecast is not None:
+            return forecast
+        if budget is not None:
+            return await self._fetch_forecast_payload(cache_key, lat, lon, budget)
+        return await _forecast_flights.do(
+            cache_key, lambda: self._fetch_forecast_payload(cache_key, lat, lon)
+        )
+
+    async def _fetch_forecast_payload(
+        self,
+        cache_key: Tuple,
+        lat: float,
+        lon: float,
+        budget: Optional[UpstreamBudget] = None,
+    ) -> ParsedForecast:
+        """Fetches and parses the forecast from OWM, caching it until the issuance bucket ends."""
+        forecast_url = f"{self.base_url}forecast"
+        forecast_params = {
+            "lat": lat,
+            "lon": lon,
+            "appid": self.api_key,
+            "units": "imperial",
+        }
+        print(
+            f"WeatherService: Attempting to fetch forecast from: {forecast_url} (lat={lat}, lon={lon})"
+        )
+        data = await get_json(forecast_url, params=forecast_params, budget=budget)
+        forecast = ParsedForecast(data)
+        print(f"WeatherService: Number of forecast items received: {len(forecast)}")
+
+        bucket_seconds = settings.FORECAST_ISSUANCE_HOURS * 3600
+        ttl = (cache_key[2] + 1) * bucket_seconds - time.time()
+        if ttl > 0:
+            _forecast_cache.set(cache_key, forecast, ttl_seconds=ttl)
+        return forecast
+
+    def _resolve_city_timezone(self, lat: float, lon: float):
+        """Returns the pytz timezone used to interpret the forecast at these coordinates."""
+        return pytz.timezone(timezone_for_coordinates(lat, lon))
+
+    @staticmethod
+    def _build_forecast_result(
+        closest_forecast: Optional[Dict[str, Any]], target_date: date
+    ) -> Dict[str, Any]:
+        """Turns the selected OWM forecast slot into the response dict used by the routes."""
+        if not closest_forecast:
+            print(
+                f"WeatherService: No forecast found for exact local date {target_date.strftime('%Y-%m-%d')} within OWM data."
+            )
             return {
-                "summary": "Could not retrieve weather data for this city. Check city name or API key.",
+                "summary": f"Detailed weather forecast for {target_date.strftime('%A, %B %d')} is not available (OpenWeatherMap free tier provides 5-day forecast or timezone mismatch).",
                 "raw_data": {},
             }
 
-        lat, lon = coords["lat"], coords["lon"]
+        main_data = closest_forecast["main"]
+        weather_desc = closest_forecast["weather"][0]["description"]
+        temp = main_data["temp"]
+        feels_like = main_data["feels_like"]
+        humidity = main_data["humidity"]
+        wind_speed = closest_forecast["wind"]["speed"]
 
-        # --- IMPORTANT: Get city's timezone using pytz ---
-        city_tz_str = self.city_timezones.get(city_name.lower())
-        if not city_tz_str:
-            print(
-                f"WeatherService: Timezone for city '{city_name}' not found in map. Defaulting to UTC for forecast interpretation."
-            )
-            # Fallback for unknown cities, might cause issues
-            city_tz = pytz.utc
-        else:
-            city_tz = pytz.timezone(city_tz_str)
-        # --- END IMPORTANT ---
+        summary = (
+            f"On {target_date.strftime('%A, %B %d')}: "
+            f"Expected conditions: {weather_desc}, temperature {temp}°F (feels like {feels_like}°F). "
+            f"Humidity around {humidity}%. Winds at {wind_speed} mph."
+        )
+        print(
+            f"WeatherService: Found forecast for {target_date.strftime('%Y-%m-%d')} - {summary}"
+        )
+        return {
+            "summary": summary,
+            "temperature_f": temp,
+            "feels_like_f": feels_like,
+            "description": weather_desc,
+            "humidity": humidity,
+            "wind_speed_mph": wind_speed,
+            "umbrella_recommended": False
+            if not (200 <= closest_forecast["weather"][0]["id"] < 600)
+            else True,
+            "raw_data": closest_forecast,
+        }
 
-        forecast_url = f"{self.base_url}forecast?lat={lat}&lon={lon}&appid={self.api_key}&units=imperial"
+    async def get_weather_forecast(
+        self, city_name: str, target_date: date
+    ) -> Dict[str, Any]:
+        results = await self.get_weather_forecasts(city_name, [target_date])
+        return results[_as_date(target_date)]
 
+    async def get_weather_forecasts(
+        self, city_name: str, target_dates: Iterable[date], raise_errors: bool = False
+    ) -> Dict[date, Dict[str, Any]]:
+        """
+        Returns the forecast result for several dates in one city, keyed by date.
+        The forecast is fetched (or read from cache) once and queried for every date.
+        If the city's forecast can't be retrieved, every date gets a result with an
+        explanatory summary and empty raw_data, or WeatherUnavailableError is raised
+        when raise_errors is set.
+        """
+        target_dates = [_as_date(d) for d in target_dates]
         try:
-            print(f"WeatherService: Attempting to fetch forecast from: {forecast_url}")
-            response = requests.get(forecast_url)
-            response.raise_for_status()
-            data = response.json()
+            return await self._fetch_forecasts(city_name, target_dates)
+        except WeatherUnavailableError as e:
+            if raise_errors:
+                raise
+            return {d: {"summary": str(e), "raw_data": {}} for d in target_dates}
 
-            print(
-                f"WeatherService: Number of forecast items received: {len(data.get('list', []))}"
+    async def _fetch_forecasts(
+        self, city_name: str, target_dates: List[date]
+    ) -> Dict[date, Dict[str, Any]]:
+        coords = await self._get_coordinates(city_name)
+        if not coords:
+            print(f"WeatherService: Could not get coordinates for {city_name}.")
+            raise WeatherUnavailableError(
+                "Could not retrieve weather data for this city. Check city name or API key."
             )
 
-            closest_forecast = None
-            min_time_diff = float("inf")
-
-            # Define the start and end of the target day in the city's local timezone
-            # and then convert them to UTC for comparison with OWM data
-            target_start_of_day_local = datetime(
-                target_date.year, target_date.month, target_date.day, 0, 0, 0
-            )
-            target_end_of_day_local = datetime(
-                target_date.year, target_date.month, target_date.day, 23, 59, 59
-            )
+        lat, lon = coords["lat"], coords["lon"]
 
-            # Make them timezone aware and convert to UTC
-            target_start_of_day_utc = city_tz.localize(
-                target_start_of_day_local
-            ).astimezone(pytz.utc)
-            target_end_of_day_utc = city_tz.localize(
-                target_end_of_day_local
-            ).astimezone(pytz.utc)
-
-            for item in data.get("list", []):
-                dt_txt = item["dt_txt"]  # This is UTC time from OWM
-                forecast_dt_utc = datetime.strptime(
-                    dt_txt, "%Y-%m-%d %H:%M:%S"
-                ).replace(tzinfo=pytz.utc)  # Make it UTC-aware
-
-                # Check if the UTC forecast time falls within our target local day's UTC window
-                if target_start_of_day_utc <= forecast_dt_utc <= target_end_of_day_utc:
-                    # If it's within the day, find the one closest to *midday local time*
-                    # Convert the forecast_dt_utc to local for time diff calculation
-                    forecast_dt_local = forecast_dt_utc.astimezone(city_tz)
-                    target_dt_midday_local = city_tz.localize(
-                        datetime(
-                            target_date.year,
-                            target_date.month,
-                            target_date.day,
-                            12,
-                            0,
-                            0,
-                        )
-                    )
-
-                    time_diff = abs(
-                        (forecast_dt_local - target_dt_midday_local).total_seconds()
-                    )
-
-                    if time_diff < min_time_diff:
-                        min_time_diff = time_diff
-                        closest_forecast = item
-
-            if closest_forecast:
-                main_data = closest_forecast["main"]
-                weather_desc = closest_forecast["weather"][0]["description"]
-                temp = main_data["temp"]
-                feels_like = main_data["feels_like"]
-                humidity = main_data["humidity"]
-                wind_speed = closest_forecast["wind"]["speed"]
-
-                summary = (
-                    f"On {target_date.strftime('%A, %B %d')}: "
-                    f"Expected conditions: {weather_desc}, temperature {temp}°F (feels like {feels_like}°F). "
-                    f"Humidity around {humidity}%. Winds at {wind_speed} mph."
-                )
-                print(
-                    f"WeatherService: Found forecast for {target_date.strftime('%Y-%m-%d')} - {summary}"
-                )
-                return {
-                    "summary": summary,
-                    "temperature_f": temp,
-                    "feels_like_f": feels_like,
-                    "description": weather_desc,
-                    "humidity": humidity,
-                    "wind_speed_mph": wind_speed,
-                    "umbrella_recommended": False
-                    if not (200 <= closest_forecast["weather"][0]["id"] < 600)
-                    else True,
-                    "raw_data": closest_forecast,
-                }
-            else:
-                print(
-                    f"WeatherService: No forecast found for exact local date {target_date.strftime('%Y-%m-%d')} within OWM data."
-                )
-                return {
-                    "summary": f"Detailed weather forecast for {target_date.strftime('%A, %B %d')} is not available (OpenWeatherMap free tier provides 5-day forecast or timezone mismatch).",
-                    "raw_data": {},
-                }
+        try:
+            city_tz = self._resolve_city_timezone(lat, lon)
+            forecast = await self._get_forecast_payload(lat, lon)
+            slots = forecast.select_slots(target_dates, city_tz)
+            return {
+                d: self._build_forecast_result(slots[d], d) for d in target_dates
+            }
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(
                 f"WeatherService: Error fetching weather forecast for {city_name}: {e}"
             )
-            return {"summary": "Error fetching weather data.", "raw_data": {}}
+            raise WeatherUnavailableError("Error fetching weather data.")
         except pytz.UnknownTimeZoneError:
             print(
-                f"WeatherService: Unknown timezone for city '{city_name}'. Please add it to city_timezones map."
+                f"WeatherService: Unknown timezone for city '{city_name}' at ({lat}, {lon})."
+            )
+            raise WeatherUnavailableError(
+                f"Could not determine timezone for {city_name}. Weather forecast unavailable."
             )
-            return {
-                "summary": f"Could not determine timezone for {city_name}. Weather forecast unavailable.",
-                "raw_data": {},
-            }
         except Exception as e:
             print(f"WeatherService: An unexpected error occurred: {e}")
-            return {
-                "summary": "An unexpected error occurred while fetching weather data.",
-                "raw_data": {},
-            }
+            raise WeatherUnavailableError(
+                "An unexpected error occurred while fetching weather data."
+            )
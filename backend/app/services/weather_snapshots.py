@@ -0,0 +1,71 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.models.weather_snapshot import WeatherSnapshot
+from app.services.weather_service import normalize_city_name
+from app.utils.cache import TTLCache
+
+# Snapshots never change once written, so cached entries only expire to bound memory
+_snapshot_cache = TTLCache(
+    max_entries=settings.WEATHER_SNAPSHOT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.WEATHER_SNAPSHOT_CACHE_TTL_SECONDS,
+)
+
+
+def snapshot_key(city_name: str, slot: Dict[str, Any]) -> str:
+    canonical = json.dumps(slot, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(
+        f"{normalize_city_name(city_name)}\n{canonical}".encode("utf-8")
+    ).hexdigest()
+
+
+def trip_weather_fields(weather_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The small summary fields of a WeatherService result, without the raw OWM slot."""
+    return {k: v for k, v in weather_data.items() if k != "raw_data"}
+
+
+class WeatherSnapshotStore:
+    """
+    Content-addressed store for raw forecast slots. Trips keep only the snapshot key
+    and summary fields; the slot itself is written once per city and forecast issue.
+    """
+
+    async def save(self, city_name: str, weather_data: Dict[str, Any]) -> Optional[str]:
+        """Stores the result's raw slot if not already stored. Returns its key, or None if there is no slot."""
+        slot = weather_data.get("raw_data")
+        if not slot:
+            return None
+        key = snapshot_key(city_name, slot)
+        if _snapshot_cache.get(key) is not None:
+            return key
+        try:
+            await WeatherSnapshot(
+                key=key,
+                city=normalize_city_name(city_name),
+                forecast_time=datetime.utcfromtimestamp(slot.get("dt", 0)),
+                data=slot,
+            ).insert()
+        except DuplicateKeyError:
+            pass  # Same content already stored, possibly by another worker
+        except Exception as e:
+            # Losing the raw slot only costs on-demand hydration; never fail the trip over it
+            print(f"WeatherSnapshotStore: Failed to store snapshot for '{city_name}': {e}")
+            return None
+        _snapshot_cache.set(key, slot)
+        return key
+
+    async def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """The raw slot for a snapshot key, or None if it is unknown."""
+        slot = _snapshot_cache.get(key)
+        if slot is not None:
+            return slot
+        snapshot = await WeatherSnapshot.find_one(WeatherSnapshot.key == key)
+        if snapshot is None:
+            return None
+        _snapshot_cache.set(key, snapshot.data)
+        return snapshot.data
@@ -1,7 +1,11 @@
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import time
 
 from fastapi import Depends, HTTPException, status  # Import FastAPI related parts
 from fastapi.security import OAuth2PasswordBearer  # Import OAuth2PasswordBearer
@@ -11,8 +15,28 @@ from app.config import settings
 from app.models.user import (
     User,
 )  # This import is crucial for get_current_user to find User
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.utils.cache import TTLCache
+from app.utils.concurrency import ConcurrencyLimiter
+
+# min_rounds makes needs_update() flag hashes made with a lower cost, so they are upgraded on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop.
+# The limiter caps queued work so a login burst gets 503s instead of an unbounded backlog.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_MAX_CONCURRENT, thread_name_prefix="bcrypt"
+)
+_hash_limiter = ConcurrencyLimiter(
+    "Password hashing",
+    max_concurrent=settings.PASSWORD_HASH_MAX_CONCURRENT,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE_DEPTH,
+)
+_hash_metrics = {"operations": 0, "total_seconds": 0.0, "max_seconds": 0.0, "rehashed": 0}
 
 # OAuth2PasswordBearer for handling token in headers
 oauth2_scheme = OAuth2PasswordBearer(
@@ -20,14 +44,88 @@ oauth2_scheme = OAuth2PasswordBearer(
 )  # This matches your auth router prefix
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# Tokens whose signature and expiry were already checked -> subject email.
+# Entries never outlive the token's own exp.
+_verified_tokens = TTLCache(max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES)
+# email -> User, so repeat callers skip the Mongo lookup. Short TTL plus explicit invalidation.
+_user_cache = TTLCache(
+    max_entries=settings.AUTH_USER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS,
+)
+
+
+def _token_cache_key(token: str) -> str:
+    # The whole token, not just its signature segment, so a reused signature
+    # with a different header or payload can never hit the cache
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def invalidate_user_cache(email: str) -> None:
+    """Drops a cached user record. Call after anything that changes or removes a user."""
+    _user_cache.pop(email)
+
+
+def get_auth_cache_stats() -> Dict[str, Dict[str, int]]:
+    return {"verified_tokens": _verified_tokens.stats(), "users": _user_cache.stats()}
+
+
+async def _run_hashing(func, *args):
+    """Runs a bcrypt operation in the hashing pool and records how long it took."""
+
+    def timed():
+        started = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - started
+
+    async with _hash_limiter.slot():
+        result, seconds = await asyncio.get_running_loop().run_in_executor(
+            _hash_executor, timed
+        )
+    _hash_metrics["operations"] += 1
+    _hash_metrics["total_seconds"] += seconds
+    _hash_metrics["max_seconds"] = max(_hash_metrics["max_seconds"], seconds)
+    return result
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return await _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password and, if the stored hash needs_update() (e.g. an older cost
+    factor), also returns a fresh hash to store. Returns (valid, new_hash or None).
+    """
+    valid, new_hash = await _run_hashing(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+    if new_hash:
+        _hash_metrics["rehashed"] += 1
+    return valid, new_hash
 
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """Hashes a password."""
-    return pwd_context.hash(password)
+    return await _run_hashing(pwd_context.hash, password)
+
+
+def get_password_hash_stats() -> Dict[str, Any]:
+    """Queue wait (from the limiter) and time spent hashing in the pool."""
+    stats = _hash_limiter.stats()
+    operations = _hash_metrics["operations"]
+    stats.update(
+        {
+            "avg_hash_ms": round(1000 * _hash_metrics["total_seconds"] / operations, 2)
+            if operations
+            else 0.0,
+            "max_hash_ms": round(1000 * _hash_metrics["max_seconds"], 2),
+            "rehashed": _hash_metrics["rehashed"],
+        }
+    )
+    return stats
 
 
 async def create_access_token(
@@ -53,29 +151,49 @@ class TokenData(BaseModel):
     email: Optional[str] = None
 
 
+def _verify_token(token: str) -> Optional[str]:
+    """Returns the token's subject email, or None if it is invalid or expired."""
+    key = _token_cache_key(token)
+    email = _verified_tokens.get(key)
+    if email is not None:
+        return email
+    try:
+        payload = jwt.decode(
+            token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+        )
+    except JWTError:
+        return None
+    email = payload.get("sub")
+    if email is None:
+        return None
+    exp = payload.get("exp")
+    if exp is not None:
+        ttl = min(float(exp) - time.time(), settings.AUTH_TOKEN_CACHE_MAX_TTL_SECONDS)
+        if ttl > 0:
+            _verified_tokens.set(key, email, ttl_seconds=ttl)
+    return email
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
-    """Decodes JWT token and retrieves current user."""
+    """Decodes JWT token and retrieves current user, both cached for repeat callers."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
-        )
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+    email = _verify_token(token)
+    if email is None:
         raise credentials_exception
+    token_data = TokenData(email=email)
 
-    # This is the crucial part: User.find_one is an async database call
+    user = _user_cache.get(token_data.email)
+    if user is not None:
+        return user
     # Ensure MongoDB is initialized before this runs
     user = await User.find_one(User.email == token_data.email)
     if user is None:
         raise credentials_exception
+    _user_cache.set(token_data.email, user)
     return user
 
 
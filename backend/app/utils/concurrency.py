@@ -0,0 +1,67 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+
+class ServiceOverloadedError(Exception):
+    """Raised when a limiter's wait queue is full. Routes turn this into HTTP 503."""
+
+
+class ConcurrencyLimiter:
+    """
+    Caps how many callers may use a resource at once and how many may wait for it.
+    Callers beyond the queue limit are rejected immediately instead of piling up.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise ServiceOverloadedError(
+                f"{self.name} is at capacity ({self.active} running, {self.waiting} queued). Please retry shortly."
+            )
+
+        self.waiting += 1
+        wait_started = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - wait_started
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(1000 * self.total_wait_seconds / self.completed, 2)
+            if self.completed
+            else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait_seconds, 2),
+        }
@@ -0,0 +1,124 @@
+import asyncio
+import random
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config import settings
+
+# Status codes worth retrying: rate limiting and transient upstream failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class UpstreamBudgetExhausted(Exception):
+    """Raised before a request that would exceed an UpstreamBudget. Not an httpx.HTTPError."""
+
+
+class UpstreamBudget:
+    """A cap on upstream HTTP requests, retries included, shared by a batch of calls."""
+
+    def __init__(self, max_requests: int):
+        self.max_requests = max_requests
+        self.spent = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.spent >= self.max_requests
+
+    def spend(self) -> None:
+        if self.exhausted:
+            raise UpstreamBudgetExhausted(f"Upstream request budget of {self.max_requests} used up")
+        self.spent += 1
+
+
+def _build_client() -> httpx.AsyncClient:
+    """Creates the pooled AsyncClient using the limits/timeouts from settings."""
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        read=settings.HTTP_READ_TIMEOUT_SECONDS,
+        write=settings.HTTP_READ_TIMEOUT_SECONDS,
+        pool=settings.HTTP_POOL_TIMEOUT_SECONDS,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Opens the shared HTTP connection pool. Called from the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Closes the shared HTTP connection pool. Called on app shutdown."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared client. Falls back to creating one lazily so services
+    still work when used outside the FastAPI lifespan (e.g. scripts).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def get_json(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    budget: Optional[UpstreamBudget] = None,
+) -> Any:
+    """
+    GETs a URL through the shared pool and returns the decoded JSON body.
+    Transport errors, timeouts and 429/5xx responses are retried with exponential
+    backoff and jitter; other 4xx responses raise immediately.
+    Raises httpx.HTTPError once retries are exhausted. Every attempt is charged to
+    `budget`, if given, and UpstreamBudgetExhausted is raised instead of sending one
+    past it.
+    """
+    client = get_http_client()
+    retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+    request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+
+    attempt = 0
+    while True:
+        if budget is not None:
+            budget.spend()
+        try:
+            response = await client.get(url, params=params, timeout=request_timeout)
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < retries:
+                raise httpx.HTTPStatusError(
+                    f"Retryable status {response.status_code}",
+                    request=response.request,
+                    response=response,
+                )
+            response.raise_for_status()
+            return response.json()
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            retryable = isinstance(e, httpx.TransportError) or (
+                e.response.status_code in RETRYABLE_STATUS_CODES
+            )
+            if not retryable or attempt >= retries:
+                raise
+            delay = settings.HTTP_RETRY_BACKOFF_SECONDS * (2**attempt)
+            delay += random.uniform(0, settings.HTTP_RETRY_BACKOFF_SECONDS)
+            print(
+                f"HTTP client: {type(e).__name__} for {url} (attempt {attempt + 1}/{retries + 1}), retrying in {delay:.2f}s"
+            )
+            attempt += 1
+            await asyncio.sleep(delay)
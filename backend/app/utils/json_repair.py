@@ -0,0 +1,231 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Parse outcome counters, see get_json_parse_stats()
+_parse_outcomes: Dict[str, int] = {"clean": 0, "extracted": 0, "repaired": 0, "failed": 0}
+
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+_SCHEMA_WRAPPER_KEYS = {"properties", "type", "required", "title", "description", "$defs"}
+
+
+class JSONRepairer:
+    """
+    Single-pass extractor/repairer for JSON objects embedded in LLM output.
+    Feed text incrementally (or all at once) and call finish() for the repaired JSON
+    text of the outermost object. Handles:
+      - prose or ```json fences before/after the object,
+      - single-quoted strings and Python literals (True/False/None),
+      - trailing commas before '}' or ']',
+      - truncated output (unterminated strings, arrays and objects are closed,
+        incomplete trailing members are dropped).
+    """
+
+    def __init__(self):
+        self._out: List[str] = []
+        self._stack: List[str] = []
+        self._started = False
+        self.done = False
+        self.changed = False  # True once any repair (not just extraction) was applied
+        self._in_string = False
+        self._quote = '"'
+        self._escape = False
+        self._string_is_key = False
+        self._token: List[str] = []  # Pending bare token (number / literal)
+        self._expect_key: List[bool] = []  # Per object level: next string is a key
+        # Last point where the output is a valid prefix that can be closed off cleanly
+        self._safe: Tuple[int, Tuple[str, ...]] = (0, ())
+
+    def _mark_safe(self) -> None:
+        self._safe = (len(self._out), tuple(self._stack))
+
+    def _flush_token(self) -> None:
+        if not self._token:
+            return
+        token = "".join(self._token)
+        self._token = []
+        if token in _LITERALS:
+            if _LITERALS[token] != token:
+                self.changed = True
+            self._out.append(_LITERALS[token])
+        else:
+            self._out.append(token)
+        self._mark_safe()
+
+    def _drop_trailing_comma(self) -> None:
+        while self._out and self._out[-1] in (" ", "\t", "\r", "\n"):
+            self._out.pop()
+        if self._out and self._out[-1] == ",":
+            self._out.pop()
+            self.changed = True
+
+    def feed(self, chunk: str) -> None:
+        for c in chunk:
+            if self.done:
+                return
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append("{")
+                    self._expect_key.append(True)
+                    self._out.append(c)
+                    self._mark_safe()
+                continue
+
+            if self._in_string:
+                self._feed_string_char(c)
+                continue
+
+            if c in "\"'":
+                self._flush_token()
+                self._in_string = True
+                self._quote = c
+                if c == "'":
+                    self.changed = True
+                in_object = self._stack[-1] == "{"
+                self._string_is_key = in_object and self._expect_key[-1]
+                self._out.append('"')
+            elif c in "{[":
+                self._flush_token()
+                self._stack.append(c)
+                if c == "{":
+                    self._expect_key.append(True)
+                self._out.append(c)
+                self._mark_safe()
+            elif c in "}]":
+                self._flush_token()
+                self._drop_trailing_comma()
+                opener = self._stack.pop()
+                if opener == "{":
+                    self._expect_key.pop()
+                # Close with what was actually opened, even if the model mismatched them
+                closer = "}" if opener == "{" else "]"
+                if closer != c:
+                    self.changed = True
+                self._out.append(closer)
+                self._mark_safe()
+                if not self._stack:
+                    self.done = True
+            elif c == ":":
+                self._flush_token()
+                if self._stack[-1] == "{":
+                    self._expect_key[-1] = False
+                self._out.append(c)
+            elif c == ",":
+                self._flush_token()
+                if self._stack[-1] == "{":
+                    self._expect_key[-1] = True
+                self._out.append(c)
+            elif c in " \t\r\n":
+                self._flush_token()
+                self._out.append(c)
+            else:
+                self._token.append(c)
+
+    def _feed_string_char(self, c: str) -> None:
+        if self._escape:
+            self._escape = False
+            if c == "'":
+                # \' is not a valid JSON escape
+                self._out.append("'")
+                self.changed = True
+            else:
+                self._out.append("\\" + c)
+            return
+        if c == "\\":
+            self._escape = True
+            return
+        if c == self._quote:
+            self._in_string = False
+            self._out.append('"')
+            if not self._string_is_key:
+                self._mark_safe()
+            return
+        if c == '"':
+            # A double quote inside a single-quoted string
+            self._out.append('\\"')
+            return
+        self._out.append(c)
+
+    def finish(self) -> Optional[str]:
+        """Returns the repaired JSON text, or None if no object was found."""
+        if not self._started:
+            return None
+        if self.done:
+            return "".join(self._out)
+
+        # Truncated: close an open value string, then cut back to the last safe point
+        self.changed = True
+        if self._in_string and not self._string_is_key:
+            if self._escape:
+                self._escape = False
+            self._out.append('"')
+            self._mark_safe()
+        elif not self._in_string and self._token and "".join(self._token) in _LITERALS:
+            self._flush_token()
+        elif not self._in_string and self._token:
+            try:
+                float("".join(self._token))
+                self._flush_token()
+            except ValueError:
+                pass
+
+        length, stack = self._safe
+        out = self._out[:length]
+        while out and out[-1] in (" ", "\t", "\r", "\n", ","):
+            out.pop()
+        for opener in reversed(stack):
+            out.append("}" if opener == "{" else "]")
+        return "".join(out)
+
+
+def unwrap_schema_values(data: Any) -> Any:
+    """
+    Recursively undoes schema-style wrapping LLMs sometimes produce:
+      {"properties": {...}} (a schema echoed back with values) -> the properties,
+      {"value": X} -> X.
+    """
+    if isinstance(data, list):
+        return [unwrap_schema_values(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if (
+        "properties" in data
+        and isinstance(data["properties"], dict)
+        and set(data) <= _SCHEMA_WRAPPER_KEYS
+    ):
+        return unwrap_schema_values(data["properties"])
+    if set(data) == {"value"}:
+        return unwrap_schema_values(data["value"])
+    return {key: unwrap_schema_values(value) for key, value in data.items()}
+
+
+def parse_llm_json(text: str) -> Any:
+    """
+    Parses the outermost JSON object from LLM output, repairing common defects.
+    Raises json.JSONDecodeError if nothing usable can be recovered.
+    """
+    try:
+        data = json.loads(text.strip())
+        _parse_outcomes["clean"] += 1
+        return data
+    except json.JSONDecodeError:
+        pass
+
+    repairer = JSONRepairer()
+    repairer.feed(text)
+    repaired = repairer.finish()
+    if repaired is None:
+        _parse_outcomes["failed"] += 1
+        raise json.JSONDecodeError("No JSON object found in response", text, 0)
+    try:
+        data = json.loads(repaired, strict=False)
+    except json.JSONDecodeError:
+        _parse_outcomes["failed"] += 1
+        raise
+    _parse_outcomes["repaired" if repairer.changed else "extracted"] += 1
+    return data
+
+
+def get_json_parse_stats() -> Dict[str, int]:
+    """How LLM JSON responses were recovered; repaired/extracted ones are avoided retries."""
+    return dict(_parse_outcomes)
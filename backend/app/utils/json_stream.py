@@ -0,0 +1,147 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Event kinds emitted by StreamingJSONObjectParser.feed()
+FIELD_EVENT = "field"  # A complete top-level field: (FIELD_EVENT, key, value)
+ITEM_EVENT = "item"  # A complete element of a streamed array field: (ITEM_EVENT, key, value)
+
+
+class StreamingJSONObjectParser:
+    """
+    Incrementally scans a JSON object as text arrives (e.g. from a streaming LLM
+    response) and reports each top-level field as soon as its value is complete.
+    Array fields named in `stream_arrays` additionally report every element as it
+    completes, so callers can act on list items before the whole object has arrived.
+    Text before the first '{' (prose, ```json fences) is ignored.
+    """
+
+    def __init__(self, stream_arrays: Iterable[str] = ()):
+        self.stream_arrays = set(stream_arrays)
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._in_string = False
+        self._escape = False
+        # Top-level key/value tracking
+        self._expect_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._await_value = False
+        self._value_start: Optional[int] = None
+        # Streamed array element tracking (only while inside a streamed array)
+        self._array_key: Optional[str] = None
+        self._await_item = False
+        self._item_start: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        return self._end is not None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        """Consumes more text and returns the events it completed, in order."""
+        self._text += chunk
+        events: List[Tuple[str, str, Any]] = []
+        text = self._text
+        while self._pos < len(text) and self._end is None:
+            i = self._pos
+            c = text[i]
+            self._pos += 1
+
+            if self._start is None:
+                if c == "{":
+                    self._start = i
+                    self._stack.append("{")
+                    self._expect_key = True
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(text[self._key_start : i + 1])
+                        self._key_start = None
+                continue
+
+            if c in " \t\r\n":
+                continue
+
+            depth = len(self._stack)
+            if depth == 1 and self._await_value:
+                self._await_value = False
+                self._value_start = i
+                if c == "[" and self._key in self.stream_arrays:
+                    self._array_key = self._key
+                    self._await_item = True
+            elif depth == 2 and self._await_item and c != "]":
+                self._await_item = False
+                self._item_start = i
+
+            if c == '"':
+                self._in_string = True
+                if depth == 1 and self._expect_key:
+                    self._expect_key = False
+                    self._key_start = i
+            elif c in "{[":
+                self._stack.append(c)
+            elif c in "}]":
+                self._stack.pop()
+                new_depth = len(self._stack)
+                if self._array_key is not None:
+                    if new_depth == 2 and self._item_start is not None:
+                        # A container element of the streamed array just closed
+                        self._emit_item(events, i + 1)
+                    elif new_depth == 1:
+                        # The streamed array itself closed; flush a trailing scalar element
+                        if self._item_start is not None:
+                            self._emit_item(events, i)
+                        self._array_key = None
+                        self._await_item = False
+                if new_depth == 0:
+                    self._emit_field(events, i)
+                    self._end = i
+            elif c == ":" and depth == 1:
+                self._await_value = True
+            elif c == ",":
+                if depth == 1:
+                    self._emit_field(events, i)
+                    self._expect_key = True
+                elif depth == 2 and self._array_key is not None:
+                    if self._item_start is not None:
+                        self._emit_item(events, i)
+                    self._await_item = True
+        return events
+
+    def _emit_field(self, events: List[Tuple[str, str, Any]], end: int) -> None:
+        if self._key is not None and self._value_start is not None:
+            raw = self._text[self._value_start : end].strip()
+            try:
+                events.append((FIELD_EVENT, self._key, json.loads(raw)))
+            except json.JSONDecodeError:
+                pass  # Malformed value; the caller still sees the whole text at the end
+        self._key = None
+        self._value_start = None
+
+    def _emit_item(self, events: List[Tuple[str, str, Any]], end: int) -> None:
+        raw = self._text[self._item_start : end].strip()
+        self._item_start = None
+        try:
+            events.append((ITEM_EVENT, self._array_key, json.loads(raw)))
+        except json.JSONDecodeError:
+            pass
+
+    def object_text(self) -> Optional[str]:
+        """The text of the outermost object, once it has been fully received."""
+        if self._start is None or self._end is None:
+            return None
+        return self._text[self._start : self._end + 1]
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far, including any surrounding prose."""
+        return self._text
@@ -0,0 +1,111 @@
+import threading
+from collections import Counter
+from typing import Any, Dict, Tuple
+
+from pymongo import monitoring
+
+
+class _ServerPool:
+    """Counters for the connection pool to one server."""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.checkouts = 0
+        self.checkout_failures: Counter = Counter()
+        self.pools_cleared = 0
+
+    def stats(self, max_pool_size: int) -> Dict[str, Any]:
+        return {
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "idle": max(0, self.open - self.checked_out),
+            "available": max(0, max_pool_size - self.checked_out),
+            "wait_queue_depth": self.waiting,
+            "max_wait_queue_depth": self.max_waiting,
+            "checkouts": self.checkouts,
+            "checkout_failures": dict(self.checkout_failures),
+            "pools_cleared": self.pools_cleared,
+        }
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks connection pool usage from PyMongo's CMAP events: connections open and
+    checked out, and operations waiting for a connection. The client keeps one pool
+    (capped at maxPoolSize) per server, so counters are kept per server address.
+    Events arrive on Motor's worker threads, so counters are updated under a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[Tuple[str, int], _ServerPool] = {}
+
+    def _pool(self, address: Tuple[str, int]) -> _ServerPool:
+        pool = self._servers.get(address)
+        if pool is None:
+            pool = self._servers[address] = _ServerPool()
+        return pool
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        with self._lock:
+            self._pool(event.address).pools_cleared += 1
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        # The server left the topology (or the client closed); its connections are gone
+        with self._lock:
+            self._servers.pop(event.address, None)
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        with self._lock:
+            self._pool(event.address).open += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        with self._lock:
+            self._pool(event.address).open -= 1
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting += 1
+            pool.max_waiting = max(pool.max_waiting, pool.waiting)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting -= 1
+            pool.checkout_failures[str(event.reason)] += 1
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting -= 1
+            pool.checked_out += 1
+            pool.checkouts += 1
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        with self._lock:
+            self._pool(event.address).checked_out -= 1
+
+    def stats(self, max_pool_size: int) -> Dict[str, Any]:
+        """Counters per server, keyed by "host:port"; maxPoolSize applies to each server separately."""
+        with self._lock:
+            return {
+                "max_pool_size": max_pool_size,
+                "servers": {
+                    f"{host}:{port}": pool.stats(max_pool_size)
+                    for (host, port), pool in sorted(self._servers.items())
+                },
+            }
@@ -0,0 +1,257 @@
+"""
+Deterministic local stand-ins for the external services the API calls:
+Gemini (via google.generativeai.GenerativeModel), OpenWeatherMap (via the shared
+httpx client) and MongoDB (via mongomock-motor). Each fake has configurable
+artificial latency so benchmarks exercise the same concurrency as production.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+# Real coordinates so the offline timezone resolver does real work
+CITIES: Dict[str, Dict[str, float]] = {
+    "chicago": {"lat": 41.8781, "lon": -87.6298},
+    "new york": {"lat": 40.7128, "lon": -74.0060},
+    "paris": {"lat": 48.8566, "lon": 2.3522},
+    "london": {"lat": 51.5074, "lon": -0.1278},
+    "tokyo": {"lat": 35.6762, "lon": 139.6503},
+    "sydney": {"lat": -33.8688, "lon": 151.2093},
+    "barcelona": {"lat": 41.3874, "lon": 2.1686},
+    "toronto": {"lat": 43.6532, "lon": -79.3832},
+}
+
+_LOCATION_TYPES = ["museum", "park", "landmark", "attraction", "restaurant", "tour"]
+_HOURS = ["9:00 AM - 5:00 PM", "10:00 AM - 6:00 PM", "Open 24 hours", "11:00 AM - 10:00 PM"]
+_CONDITIONS = [(800, "clear sky"), (802, "scattered clouds"), (500, "light rain"), (804, "overcast clouds")]
+
+
+class Latency:
+    """A mean delay with proportional uniform jitter, drawn from a seeded RNG."""
+
+    def __init__(self, mean_ms: float, jitter: float = 0.2, seed: int = 0):
+        self.mean = mean_ms / 1000.0
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+
+    async def sleep(self) -> None:
+        if self.mean <= 0:
+            return
+        spread = self.mean * self.jitter
+        await asyncio.sleep(max(0.0, self.mean + self._rng.uniform(-spread, spread)))
+
+
+def _rng_for(text: str) -> random.Random:
+    """Same input text, same fake answer."""
+    return random.Random(int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16))
+
+
+# --- Gemini ---
+
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeStream:
+    """Async-iterable response for stream=True, yielding the JSON in a few chunks."""
+
+    def __init__(self, text: str, latency: Latency, chunks: int = 6):
+        self._text = text
+        self._latency = latency
+        self._chunks = chunks
+
+    async def _iterate(self):
+        size = max(1, len(self._text) // self._chunks)
+        for start in range(0, len(self._text), size):
+            await asyncio.sleep(self._latency.mean / self._chunks)
+            yield _FakeResponse(self._text[start : start + size])
+
+    def __aiter__(self):
+        return self._iterate()
+
+
+def _fake_suggestions(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "general_weather_advice": "Mild with a chance of afternoon clouds.",
+        "clothing_suggestion": "Layers and comfortable walking shoes.",
+        "umbrella_needed": rng.random() < 0.3,
+        "location_suggestions": [
+            {
+                "name": f"Bench Spot {rng.randint(1, 500)}",
+                "address": f"{rng.randint(1, 999)} Benchmark Ave",
+                "type": rng.choice(_LOCATION_TYPES),
+                "estimated_time_spent_minutes": rng.choice([45, 60, 90, 120]),
+                "admission_cost_usd": rng.choice([None, 0.0, 15.0, 25.0]),
+                "reasons_for_suggestion": ["Matches your interests"],
+                "operating_hours_summary": rng.choice(_HOURS),
+            }
+            for _ in range(6)
+        ],
+    }
+
+
+def _fake_analysis(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "weather_summary": "Partly cloudy, 68°F.",
+        "clothing_suggestion": "Light jacket.",
+        "carry_umbrella": rng.random() < 0.3,
+        "estimated_gas_cost_usd": None,
+        "estimated_public_transit_cost_usd": 5.0,
+        "estimated_ride_share_cost_usd": 40.0,
+        "general_money_tips": "Buy a day pass.",
+        "transportation_tips": "Transit runs every 10 minutes downtown.",
+        "other_carry_items": ["water bottle", "sunscreen"],
+        "location_info": [{"name": "Bench Spot", "info": "Popular in the morning."}],
+    }
+
+
+def _fake_itinerary(rng: random.Random) -> Dict[str, Any]:
+    times = [("9:00 AM", "10:30 AM"), ("11:00 AM", "12:30 PM"), ("1:30 PM", "3:00 PM")]
+    return {
+        "itinerary_steps": [
+            {
+                "activity": f"Visit stop {i + 1}",
+                "start_time": start,
+                "end_time": end,
+                "location_name": f"Stop {i + 1}",
+                "transport_mode_to_next": "public_transit",
+                "estimated_travel_time_minutes": 20,
+            }
+            for i, (start, end) in enumerate(times)
+        ],
+        "total_estimated_cost_usd": float(rng.randint(40, 160)),
+        "feasibility_status": "possible",
+        "feasibility_notes": "Comfortable pace.",
+        "total_travel_time_minutes": 40,
+        "total_activity_time_minutes": 270,
+    }
+
+
+def _fake_notes(rng: random.Random) -> Dict[str, Any]:
+    return {"step_notes": ["Book ahead."] * 8, "feasibility_notes": "Enjoy the day."}
+
+
+class FakeGenerativeModel:
+    """
+    Replaces google.generativeai.GenerativeModel. The response shape is picked by
+    matching the precompiled structured-output config the service passes in, so
+    the real prompt building, parsing, caching, limiting and tiering all run.
+    """
+
+    latency: Latency = Latency(0)
+    fast_latency: Latency = Latency(0)
+    calls: int = 0
+
+    def __init__(self, model_name: str = "fake", *args: Any, **kwargs: Any):
+        self.model_name = model_name
+
+    def _payload(self, prompt: str, generation_config: Any) -> Dict[str, Any]:
+        # Imported lazily: app modules must not load before the benchmark configures settings
+        from app.models.gemini_models import (
+            InitialTripSuggestions,
+            ItineraryNotes,
+            OptimizedItinerary,
+            TripPlanningAnalysis,
+        )
+        from app.services.gemini_schemas import structured_output_for
+
+        rng = _rng_for(prompt)
+        builders = {
+            InitialTripSuggestions: _fake_suggestions,
+            TripPlanningAnalysis: _fake_analysis,
+            OptimizedItinerary: _fake_itinerary,
+            ItineraryNotes: _fake_notes,
+        }
+        for model, build in builders.items():
+            if generation_config is structured_output_for(model).generation_config:
+                return build(rng)
+        raise ValueError("FakeGenerativeModel: unrecognized generation_config")
+
+    async def generate_content_async(
+        self, prompt: Any, generation_config: Any = None, stream: bool = False, **kwargs: Any
+    ):
+        FakeGenerativeModel.calls += 1
+        latency = self.fast_latency if "flash" in self.model_name else self.latency
+        text = json.dumps(self._payload(str(prompt), generation_config))
+        if stream:
+            return _FakeStream(text, latency)
+        await latency.sleep()
+        return _FakeResponse(text)
+
+
+def install_fake_gemini(latency_ms: float, fast_latency_ms: float, jitter: float, seed: int) -> None:
+    import google.generativeai as genai
+
+    FakeGenerativeModel.latency = Latency(latency_ms, jitter, seed)
+    FakeGenerativeModel.fast_latency = Latency(fast_latency_ms, jitter, seed + 1)
+    genai.GenerativeModel = FakeGenerativeModel
+
+
+# --- OpenWeatherMap ---
+
+
+def _fake_forecast(lat: float, lon: float) -> Dict[str, Any]:
+    rng = _rng_for(f"{lat:.2f},{lon:.2f}")
+    start = int(time.time()) // 10800 * 10800
+    items: List[Dict[str, Any]] = []
+    for i in range(40):  # 5 days of 3-hour slots, like the free tier
+        condition_id, description = rng.choice(_CONDITIONS)
+        temp = round(rng.uniform(40, 85), 1)
+        items.append(
+            {
+                "dt": start + i * 10800,
+                "main": {"temp": temp, "feels_like": temp - 2, "humidity": rng.randint(30, 90)},
+                "weather": [{"id": condition_id, "description": description}],
+                "wind": {"speed": round(rng.uniform(0, 20), 1)},
+            }
+        )
+    return {"cod": "200", "cnt": len(items), "list": items}
+
+
+def build_owm_client(latency: Latency) -> httpx.AsyncClient:
+    """An httpx client whose transport answers OWM geocoding and forecast requests locally."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await latency.sleep()
+        params = request.url.params
+        if request.url.path.endswith("/weather"):
+            city = CITIES.get(" ".join(params.get("q", "").lower().split()))
+            if city is None:
+                return httpx.Response(404, json={"cod": "404", "message": "city not found"})
+            return httpx.Response(200, json={"coord": city})
+        if request.url.path.endswith("/forecast"):
+            return httpx.Response(
+                200, json=_fake_forecast(float(params["lat"]), float(params["lon"]))
+            )
+        return httpx.Response(404, json={"message": "not faked"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def install_fake_owm(latency: Latency) -> None:
+    from app.utils import http_client
+
+    # init_http_client() keeps an open client, so the app lifespan adopts this one
+    http_client._client = build_owm_client(latency)
+
+
+# --- MongoDB ---
+
+
+def install_fake_mongo() -> None:
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError as e:
+        raise SystemExit(
+            "The benchmarks need mongomock-motor: pip install -r benchmarks/requirements.txt"
+        ) from e
+    from app import database
+
+    database.AsyncIOMotorClient = AsyncMongoMockClient
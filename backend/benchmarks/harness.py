@@ -0,0 +1,247 @@
+"""
+Load driver: runs user sessions against the ASGI app at a fixed concurrency and
+collects per-route latencies, throughput and event-loop lag.
+"""
+
+import asyncio
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fakes import CITIES
+
+API = "/api/v1"
+_INTERESTS = [
+    "Culture & Museums",
+    "Outdoor & Nature",
+    "Food & Drink",
+    "Architecture & City Views",
+    "Family-Friendly",
+    "Shopping & Entertainment",
+]
+
+
+def percentile(samples: List[float], p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(1000 * seconds, 2)
+
+
+class SessionFailed(Exception):
+    """A step returned a non-2xx status; the rest of the session is skipped."""
+
+
+class Recorder:
+    """Latencies and status codes per route label."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.enabled = True
+
+    async def call(self, route: str, request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await request
+        if self.enabled:
+            self.latencies[route].append(time.perf_counter() - started)
+            self.statuses[route][response.status_code] += 1
+        if response.status_code >= 400:
+            raise SessionFailed(f"{route} -> {response.status_code}: {response.text[:200]}")
+        return response
+
+    def route_report(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for route, samples in self.latencies.items():
+            statuses = self.statuses[route]
+            report[route] = {
+                "count": len(samples),
+                "errors": sum(n for code, n in statuses.items() if code >= 400),
+                "mean_ms": _ms(sum(samples) / len(samples)),
+                "p50_ms": _ms(percentile(samples, 50)),
+                "p95_ms": _ms(percentile(samples, 95)),
+                "p99_ms": _ms(percentile(samples, 99)),
+            }
+        return report
+
+
+class LoopLagMonitor:
+    """Samples how late a short periodic sleep wakes up; blocking work on the loop shows up here."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "samples": len(self.samples),
+            "p50_ms": _ms(percentile(self.samples, 50)),
+            "p99_ms": _ms(percentile(self.samples, 99)),
+            "max_ms": _ms(max(self.samples) if self.samples else None),
+        }
+
+
+async def run_session(
+    client: httpx.AsyncClient, recorder: Recorder, session_id: str, rng: random.Random
+) -> None:
+    """register -> token -> initial suggestions -> analysis -> optimize -> list trips -> trip detail."""
+    email = f"bench-{session_id}@example.com"
+    password = "bench-password"
+    await recorder.call(
+        "POST /auth/register",
+        client.post(f"{API}/auth/register", json={"email": email, "password": password}),
+    )
+    token = await recorder.call(
+        "POST /auth/token",
+        client.post(f"{API}/auth/token", data={"username": email, "password": password}),
+    )
+    headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+
+    preferences = {
+        "interests": rng.sample(_INTERESTS, 2),
+        "pace": rng.choice(["fast-paced", "relaxed"]),
+        "preferred_transport": rng.sample(["walking", "public_transit", "ride_share"], 2),
+        "budget_range": rng.choice(["budget", "mid-range", "luxury"]),
+    }
+    plan = {
+        "destination": rng.choice(list(CITIES)).title(),
+        "return_time": rng.choice(["9 PM", "10 PM", "11 PM"]),
+        "trip_date": (date.today() + timedelta(days=rng.randint(0, 4))).isoformat(),
+        **preferences,
+    }
+    initial = await recorder.call(
+        "POST /trip/plan/initial-suggestions",
+        client.post(f"{API}/trip/plan/initial-suggestions", json=plan, headers=headers),
+    )
+    suggestions = initial.json()
+
+    selection = {
+        "trip_id": suggestions["trip_id"],
+        "destination": plan["destination"],
+        "trip_date": plan["trip_date"],
+        "return_time": plan["return_time"],
+        "user_preferences": preferences,
+        "selected_locations": suggestions["location_suggestions"][: rng.randint(2, 5)],
+    }
+    # Sequential, like the frontend
+    await recorder.call(
+        "POST /trip/plan/detailed-analysis",
+        client.post(f"{API}/trip/plan/detailed-analysis", json=selection, headers=headers),
+    )
+    await recorder.call(
+        "POST /trip/plan/optimize-itinerary",
+        client.post(f"{API}/trip/plan/optimize-itinerary", json=selection, headers=headers),
+    )
+    listing = await recorder.call(
+        "GET /trip/trips", client.get(f"{API}/trip/trips", headers=headers)
+    )
+    await recorder.call(
+        "GET /trip/trips/{trip_id}",
+        client.get(f"{API}/trip/trips/{listing.json()['trips'][0]['id']}", headers=headers),
+    )
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    sessions: int,
+    concurrency: int,
+    warmup: int,
+    seed: int,
+    run_id: str,
+) -> Dict[str, Any]:
+    """Runs warmup sessions (not recorded), then `sessions` sessions across `concurrency` workers."""
+    recorder = Recorder()
+    failures: List[str] = []
+
+    async def workers(count: int, prefix: str) -> None:
+        next_id = iter(range(count))
+
+        async def worker(worker_id: int) -> None:
+            rng = random.Random(seed * 1000 + worker_id)
+            for i in next_id:
+                try:
+                    await run_session(client, recorder, f"{run_id}-{prefix}{i}", rng)
+                except SessionFailed as e:
+                    failures.append(str(e))
+
+        await asyncio.gather(*(worker(w) for w in range(min(concurrency, count))))
+
+    if warmup:
+        recorder.enabled = False
+        await workers(warmup, "w")
+        recorder.enabled = True
+        failures.clear()
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    await workers(sessions, "s")
+    wall = time.perf_counter() - started
+    await monitor.stop()
+
+    total_requests = sum(len(samples) for samples in recorder.latencies.values())
+    return {
+        "wall_seconds": round(wall, 3),
+        "requests": total_requests,
+        "requests_per_second": round(total_requests / wall, 2) if wall else None,
+        "sessions_completed": sessions - len(failures),
+        "sessions_failed": len(failures),
+        "failure_samples": failures[:5],
+        "routes": recorder.route_report(),
+        "loop_lag": monitor.report(),
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regressions against a stored baseline: throughput down, or per-route p95 / loop-lag p99
+    up, by more than `tolerance`. Differences under 5 ms are treated as noise.
+    """
+    noise_ms = 5.0
+    regressions = []
+    base_rps, rps = baseline.get("requests_per_second"), report.get("requests_per_second")
+    if base_rps and rps is not None and rps < base_rps * (1 - tolerance):
+        regressions.append(f"throughput {rps} req/s vs baseline {base_rps} req/s")
+
+    for route, base in baseline.get("routes", {}).items():
+        current = report["routes"].get(route)
+        if current is None:
+            regressions.append(f"{route}: missing from this run")
+            continue
+        before, after = base.get("p95_ms"), current.get("p95_ms")
+        if before is not None and after is not None:
+            if after > before * (1 + tolerance) and after - before > noise_ms:
+                regressions.append(f"{route}: p95 {after} ms vs baseline {before} ms")
+        if current.get("errors", 0) > base.get("errors", 0):
+            regressions.append(f"{route}: {current['errors']} errors vs baseline {base.get('errors', 0)}")
+
+    before, after = baseline.get("loop_lag", {}).get("p99_ms"), report["loop_lag"].get("p99_ms")
+    if before is not None and after is not None:
+        if after > before * (1 + tolerance) and after - before > noise_ms:
+            regressions.append(f"event-loop lag p99 {after} ms vs baseline {before} ms")
+    return regressions
@@ -0,0 +1,172 @@
+"""
+Offline benchmark for the trip-planning API.
+
+Boots app.main:app in-process against mongomock-motor and local fakes for Gemini
+and OpenWeatherMap, drives register -> token -> initial suggestions -> analysis ->
+optimize -> list trips -> trip detail sessions at a target concurrency, and reports req/s,
+per-route p50/p95/p99 and event-loop lag.
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --sessions 50 --concurrency 10 --save-baseline main
+    python -m benchmarks.run --sessions 50 --concurrency 10 --compare main
+
+--compare exits with status 1 when a regression beyond --tolerance is found.
+Baselines are only comparable between runs with the same options on the same machine.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# Options that change what is measured; a baseline recorded with different values is not comparable
+_COMPARABLE_OPTIONS = (
+    "sessions",
+    "concurrency",
+    "gemini_latency_ms",
+    "gemini_fast_latency_ms",
+    "owm_latency_ms",
+    "jitter",
+    "gemini_cache",
+)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=50, help="Measured sessions.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent sessions.")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured sessions run first.")
+    parser.add_argument("--gemini-latency-ms", type=float, default=800.0, help="Pro-tier model latency.")
+    parser.add_argument("--gemini-fast-latency-ms", type=float, default=300.0, help="Fast-tier model latency.")
+    parser.add_argument("--owm-latency-ms", type=float, default=80.0, help="OpenWeatherMap latency.")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency jitter as a fraction of the mean.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--gemini-cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Keep the Gemini response cache on (the production default).",
+    )
+    parser.add_argument("--save-baseline", metavar="NAME", help="Store this run as a named baseline.")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against a named baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression.")
+    parser.add_argument("--output", metavar="FILE", help="Also write the JSON report here.")
+    parser.add_argument("--show-app-logs", action="store_true", help="Don't silence the app's prints.")
+    return parser.parse_args()
+
+
+def _configure_environment(args: argparse.Namespace) -> None:
+    """Settings are read at import time, so this must run before any app module is imported."""
+    defaults = {
+        "GOOGLE_API_KEY": "bench",
+        "MONGODB_URI": "mongodb://bench.invalid:27017",
+        "JWT_SECRET_KEY": "bench-secret",
+        "OPENWEATHER_API_KEY": "bench",
+        "Maps_API_KEY": "bench",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    os.environ["DB_NAME"] = "voyagepal_bench"
+    os.environ["WEATHER_PREFETCH_ENABLED"] = "false"
+    os.environ["GEMINI_CACHE_ENABLED"] = "true" if args.gemini_cache else "false"
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    from benchmarks import fakes
+    from benchmarks.harness import drive
+
+    fakes.install_fake_gemini(
+        args.gemini_latency_ms, args.gemini_fast_latency_ms, args.jitter, args.seed
+    )
+    fakes.install_fake_mongo()
+    from app.main import app
+
+    fakes.install_fake_owm(fakes.Latency(args.owm_latency_ms, args.jitter, args.seed + 2))
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            report = await drive(
+                client,
+                sessions=args.sessions,
+                concurrency=args.concurrency,
+                warmup=args.warmup,
+                seed=args.seed,
+                run_id=str(int(time.time() * 1000)),
+            )
+    report["gemini_model_calls"] = fakes.FakeGenerativeModel.calls
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"\n{report['requests']} requests in {report['wall_seconds']}s "
+        f"= {report['requests_per_second']} req/s "
+        f"({report['sessions_completed']} sessions ok, {report['sessions_failed']} failed)"
+    )
+    print(f"{'route':40} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:40} {stats['count']:>6} {stats['errors']:>4} "
+            f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}"
+        )
+    lag = report["loop_lag"]
+    print(f"event-loop lag: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms")
+    for failure in report["failure_samples"]:
+        print(f"  failed session: {failure}")
+
+
+def main() -> int:
+    args = _parse_args()
+    _configure_environment(args)
+
+    app_output = None if args.show_app_logs else io.StringIO()
+    with contextlib.redirect_stdout(app_output) if app_output else contextlib.nullcontext():
+        report = asyncio.run(_run(args))
+    report["options"] = {option: getattr(args, option) for option in _COMPARABLE_OPTIONS}
+
+    _print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(report, indent=2))
+        print(f"Saved baseline to {path}")
+
+    if args.compare:
+        from benchmarks.harness import compare
+
+        path = BASELINE_DIR / f"{args.compare}.json"
+        if not path.exists():
+            print(f"No baseline named '{args.compare}' in {BASELINE_DIR}")
+            return 2
+        baseline = json.loads(path.read_text())
+        if baseline.get("options") != report["options"]:
+            print(f"Warning: baseline options {baseline.get('options')} differ from this run's.")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions vs '{args.compare}' (tolerance {args.tolerance:.0%}):")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"No regressions vs '{args.compare}' (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
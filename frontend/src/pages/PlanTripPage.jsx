@@ -26,6 +26,9 @@ export default function PlanTripPage() {
     return null;
   });
 
+  // Trip version from the last plan step, sent back so stale updates get a 409
+  const [tripVersion, setTripVersion] = useState(null);
+
   // Effect to save tripId to localStorage whenever it changes
   useEffect(() => {
     if (typeof window !== "undefined") {
@@ -58,6 +61,7 @@ export default function PlanTripPage() {
       });
       setSuggestions(response.data);
       setTripId(response.data.trip_id); // Store the generated trip ID (this will trigger useEffect to save to localStorage)
+      setTripVersion(response.data.version);
       setStep(2); // Move to suggestions display
     } catch (err) {
       console.error(
@@ -108,8 +112,10 @@ export default function PlanTripPage() {
           budget_range: tripRequestData.budgetRange,
         },
         selected_locations: selectedLocations,
+        expected_version: tripVersion,
       });
       setDetailedAnalysis(response.data);
+      setTripVersion(response.data.version);
       setStep(3); // Move to detailed analysis display
     } catch (err) {
       console.error(
@@ -147,8 +153,10 @@ export default function PlanTripPage() {
           budget_range: tripRequestData.budgetRange,
         },
         selected_locations: selectedLocations,
+        expected_version: tripVersion,
       });
       setOptimizedItinerary(response.data);
+      setTripVersion(response.data.version);
       setStep(4); // Move to itinerary display
     } catch (err) {
       console.error(
@@ -170,6 +178,7 @@ export default function PlanTripPage() {
     setDetailedAnalysis(null);
     setOptimizedItinerary(null);
     setTripId(null); // Clear tripId from state
+    setTripVersion(null);
     localStorage.removeItem("currentTripId"); // Clear from localStorage
     setError(null);
   };
@@ -4,25 +4,33 @@ import LoadingSpinner from '../components/LoadingSpinner.jsx';
 
 const SavedTripsPage = () => {
   const [savedTrips, setSavedTrips] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
 
+  // The API returns one page of trip summaries at a time, newest first
+  const fetchSavedTrips = async (cursor = null) => {
+    try {
+      const response = await api.get('/trip/trips', { params: cursor ? { cursor } : {} });
+      setSavedTrips(prev => (cursor ? [...prev, ...response.data.trips] : response.data.trips));
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      console.error('Error fetching saved trips:', err.response?.data || err.message);
+      setError(err.response?.data?.detail || 'Failed to fetch saved trips.');
+    }
+  };
+
   useEffect(() => {
-    const fetchSavedTrips = async () => {
-      try {
-        const response = await api.get('/trip/trips');
-        setSavedTrips(response.data);
-      } catch (err) {
-        console.error('Error fetching saved trips:', err.response?.data || err.message);
-        setError(err.response?.data?.detail || 'Failed to fetch saved trips.');
-      } finally {
-        setLoading(false);
-      }
-    };
-
-    fetchSavedTrips();
+    fetchSavedTrips().finally(() => setLoading(false));
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchSavedTrips(nextCursor);
+    setLoadingMore(false);
+  };
+
   if (loading) {
     return <LoadingSpinner />;
   }
@@ -42,19 +50,22 @@ const SavedTripsPage = () => {
             <div key={trip.id} className="list-item-card">
               <h3>{trip.destination} - {new Date(trip.trip_date).toLocaleDateString()}</h3>
               <p>Return Time: {trip.return_time}</p>
-              <p>Pace: {trip.preferences?.pace || 'N/A'}</p>
-              <p>Selected Locations: {trip.selected_locations?.map(loc => loc.name).join(', ') || 'None'}</p>
-              {trip.itinerary && trip.itinerary.length > 0 && (
-                <p>Itinerary Steps: {trip.itinerary.length}</p>
-              )}
-              {trip.estimated_costs?.overall_total_estimated_cost_usd && (
-                <p>Est. Total Cost: ${trip.estimated_costs.overall_total_estimated_cost_usd.toFixed(2)}</p>
+              <p>Status: {trip.status}</p>
+              <p>Pace: {trip.pace || 'N/A'}</p>
+              <p>Selected Locations: {trip.location_names.join(', ') || 'None'}</p>
+              {trip.total_estimated_cost_usd != null && (
+                <p>Est. Total Cost: ${trip.total_estimated_cost_usd.toFixed(2)}</p>
               )}
               {/* You can add a button here to view full details of a saved trip */}
             </div>
           ))}
         </div>
       )}
+      {nextCursor && (
+        <button onClick={loadMore} disabled={loadingMore}>
+          {loadingMore ? 'Loading...' : 'Load more'}
+        </button>
+      )}
     </div>
   );
 };